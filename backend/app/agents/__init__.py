@@ -1,5 +1,13 @@
 # Import agents from their individual files
-from .agent_a_deal_scout import DealScoutAgent, MockProvider, ProviderAdapter
+from .agent_a_deal_scout import (
+    DealScoutAgent,
+    MockProvider,
+    AsyncMockProvider,
+    PriceAnalysis,
+    ProviderAdapter,
+    AsyncProviderAdapter,
+)
+from .deal_catalog import CatalogProvider
 from .agent_b_cart_builder import CartBuilderAgent
 from .agent_c_order_executor import OrderExecutorAgent
 from .agent_d_overseer import OverseerAgent, WorkflowResult, AgentMetrics
@@ -10,7 +18,11 @@ __all__ = [
     "OrderExecutorAgent",
     "OverseerAgent",
     "MockProvider",
+    "AsyncMockProvider",
+    "PriceAnalysis",
     "ProviderAdapter",
+    "AsyncProviderAdapter",
+    "CatalogProvider",
     "WorkflowResult",
     "AgentMetrics"
 ]
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from typing import List, Dict, Protocol, Iterable, Any
+from typing import List, Dict, Protocol, Iterable, Any, Optional
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cached_property
+import asyncio
+import inspect
 import random
 import hashlib
 import json
 
+import numpy as np
 
 from openai import AsyncOpenAI
 
@@ -19,6 +23,13 @@ from ..schemas.groceries import (
     PlatformPrice,
 )
 from ..config import settings
+from ..cache import TieredCache
+from ..tracing import span, traced
+from .catalog_index import CatalogIndex
+from .deal_catalog import CatalogProvider
+from .grocery_grammar import parse_grocery_text
+from .normalize import normalize_item_name
+from .price_cache import CachedPricing, item_ident, price_query_key, prices_for_item
 
 # Initialize OpenAI client
 client = AsyncOpenAI(api_key=settings.openai_api_key)
@@ -29,6 +40,11 @@ class ProviderAdapter(Protocol):
     def search(self, query: GroceryItem, location_pin: str | None) -> ProviderPrice | None: ...
 
 
+class AsyncProviderAdapter(Protocol):
+    def name(self) -> str: ...
+    async def search(self, query: GroceryItem, location_pin: str | None) -> ProviderPrice | None: ...
+
+
 # Comprehensive mock price database for Indian grocery items
 MOCK_PRICE_DATABASE = {
     # Staple Foods
@@ -160,12 +176,32 @@ PLATFORM_STRATEGIES = {
     },
 }
 
+# Shared name -> catalog entry matcher used by every provider
+CATALOG_INDEX = CatalogIndex(MOCK_PRICE_DATABASE)
+
+
+# Parsed grocery texts, keyed by normalized text
+parse_cache: TieredCache[Dict[str, Any]] = TieredCache(
+    "parse",
+    ttl_seconds=settings.parse_cache_ttl_seconds,
+    maxsize=settings.parse_cache_max_entries,
+    redis_url=settings.redis_url,
+)
+
+
+def _parse_cache_key(grocery_text: str) -> str:
+    normalized = normalize_item_name(grocery_text).strip(" .!?")
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
 async def GroceryTextParser(grocery_text: str) -> Dict[str, Any]:
     """
-    AI-powered grocery text parser to extract quantities, units, and item names.
+    Grocery text parser to extract quantities, units, and item names.
 
-    This function uses GPT-4o-mini to parse free-text like
-    "1kg of rice and 2 liters of milk" into structured items.
+    Parses free-text like "1kg of rice and 2 liters of milk" into structured
+    items. Results are cached by normalized text. On a miss the local grammar
+    parser is tried first; GPT-4o-mini is only called when its confidence is
+    below PARSE_LOCAL_MIN_CONFIDENCE.
 
     Args:
         grocery_text (str): Free-text grocery input (e.g., "1kg rice and 2 liters milk").
@@ -183,6 +219,19 @@ async def GroceryTextParser(grocery_text: str) -> Dict[str, Any]:
         >>> items = await GroceryTextParser("1kg rice and 2 liters milk")
         {"platform": null, "items": [{"name": "rice", "quantity": 1, "unit": "kg"}, {"name": "milk", "quantity": 2, "unit": "liter"}]}
     """
+    async def parse() -> Dict[str, Any]:
+        parsed, confidence = parse_grocery_text(grocery_text, CATALOG_INDEX)
+        if confidence >= settings.parse_local_min_confidence:
+            return parsed
+        return await _parse_with_llm(grocery_text)
+
+    parsed = await parse_cache.get_or_compute(_parse_cache_key(grocery_text), parse)
+    # Callers get their own copy of the cached value
+    return {"platform": parsed.get("platform"), "items": [dict(item) for item in parsed.get("items", [])]}
+
+
+async def _parse_with_llm(grocery_text: str) -> Dict[str, Any]:
+    """Parse grocery text with GPT-4o-mini"""
     prompt = f"""
 You are a precise parser for grocery shopping inputs.
 Extract a clean, structured list of grocery items with quantity and unit from the user text.
@@ -238,6 +287,18 @@ Respond ONLY as a strict JSON object in this schema:
     return data
 
 
+@traced("catalog.match")
+def _lookup_base_price(item_name: str) -> float | None:
+    """Resolve an item name to its mock catalog base price"""
+    # Unknown items return None instead of fallback pricing
+    return CATALOG_INDEX.base_price(item_name)
+
+
+def _item_hash(item_name: str) -> int:
+    """Stable per-item seed used for mock discounts, ETAs and stock"""
+    return int(hashlib.md5(item_name.encode()).hexdigest()[:8], 16)
+
+
 @dataclass
 class MockProvider:
     provider_name: str
@@ -250,55 +311,37 @@ class MockProvider:
 
     def _get_base_price(self, item_name: str) -> float | None:
         """Get base price for an item from the mock database"""
-        # Try exact match first
-        if item_name.lower() in MOCK_PRICE_DATABASE:
-            return MOCK_PRICE_DATABASE[item_name.lower()]["base_price"]
-        
-        # Try partial matches for common variations (require at least 3 letters)
-        item_lower = item_name.lower()
-        if len(item_lower) < 3:
-            return None  # Don't match items with less than 3 characters
-            
-        for db_item, data in MOCK_PRICE_DATABASE.items():
-            if (db_item in item_lower or 
-                item_lower in db_item or 
-                any(word in item_lower for word in db_item.split())):
-                return data["base_price"]
-        
-        # Return None for unknown items instead of fallback pricing
-        return None
+        return _lookup_base_price(item_name)
 
-    def _calculate_discount(self, item_name: str, base_price: float) -> float:
+    def _calculate_discount(self, item_name: str, base_price: float, rng: random.Random) -> float:
         """Calculate platform-specific discount"""
         strategy = PLATFORM_STRATEGIES.get(self.provider_name, PLATFORM_STRATEGIES["amazon_fresh"])
         min_discount, max_discount = strategy["discount_range"]
         
         # Generate consistent but varied discounts using item name as seed
-        item_hash = int(hashlib.md5(item_name.encode()).hexdigest()[:8], 16)
+        item_hash = _item_hash(item_name)
         discount_percent = min_discount + (item_hash % (max_discount - min_discount + 1))
         
         # Apply some randomness for realistic variation
-        random.seed(item_hash)
-        variation = random.uniform(0.8, 1.2)
+        rng.seed(item_hash)
+        variation = rng.uniform(0.8, 1.2)
         discount_percent *= variation
         
         return min(max_discount, max(min_discount, discount_percent))
 
-    def _get_delivery_details(self) -> tuple[float, int]:
+    def _get_delivery_details(self, rng: random.Random) -> tuple[float, int]:
         """Get delivery fee and ETA for the platform"""
         strategy = PLATFORM_STRATEGIES.get(self.provider_name, PLATFORM_STRATEGIES["amazon_fresh"])
         
         # Vary delivery times to make them more realistic
         eta_min, eta_max = strategy["eta_min"], strategy["eta_max"]
-        eta = random.randint(eta_min, eta_max)
+        eta = rng.randint(eta_min, eta_max)
         
         return strategy["delivery_fee"], eta
 
     def _check_stock_availability(self, item_name: str) -> bool:
         """Simulate stock availability (95% chance of being in stock)"""
-        item_hash = int(hashlib.md5(item_name.encode()).hexdigest()[:8], 16)
-        random.seed(item_hash)
-        return random.random() > 0.05  # 95% availability
+        return random.Random(_item_hash(item_name)).random() > 0.05  # 95% availability
 
     def _get_category_multiplier(self, item_name: str, strategy: dict) -> float:
         """Get category-specific multiplier for the item"""
@@ -312,6 +355,7 @@ class MockProvider:
         
         return category_multiplier
 
+    @traced("provider.search", lambda self, query, location_pin: {"provider": self.provider_name, "item": query.name})
     def search(self, query: GroceryItem, location_pin: str | None) -> ProviderPrice | None:
         # Get base price for the item
         base_price = self._get_base_price(query.name)
@@ -333,12 +377,14 @@ class MockProvider:
         brand_factor = 0.9 if (query.preferred_brand and len(query.preferred_brand) % 2 == 0) else 1.0
         platform_price *= brand_factor
         
-        # Calculate discount
-        discount_percent = self._calculate_discount(query.name, platform_price)
+        # Calculate discount (a private generator keeps concurrent searches
+        # from interleaving draws on the global RNG)
+        rng = random.Random()
+        discount_percent = self._calculate_discount(query.name, platform_price, rng)
         discounted_price = platform_price * (1 - discount_percent / 100)
         
         # Get delivery details
-        delivery_fee, eta = self._get_delivery_details()
+        delivery_fee, eta = self._get_delivery_details(rng)
         
         # Check stock availability
         in_stock = self._check_stock_availability(query.name)
@@ -373,40 +419,224 @@ class MockProvider:
         )
 
 
-class DealScoutAgent:
-    def __init__(self, providers: Iterable[ProviderAdapter]):
-        self.providers: List[ProviderAdapter] = list(providers)
+@dataclass
+class AsyncMockProvider:
+    """MockProvider behind simulated network latency, for benchmarking the async fan-out"""
+    provider_name: str
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    _provider: MockProvider = field(init=False, repr=False)
+    _rng: random.Random = field(init=False, repr=False)
 
-    def aggregate_prices(self, query: PriceQuery) -> PriceResult:
-        # Group results by item
-        item_results: Dict[str, List[ProviderPrice]] = {}
-        
-        for item in query.items:
-            item_key = f"{item.name}_{item.quantity}_{item.unit}"
-            item_results[item_key] = []
-            
-            for provider in self.providers:
-                price = provider.search(item, query.location_pin)
-                if price:
-                    item_results[item_key].append(price)
-        
-        # Transform to frontend format
+    def __post_init__(self):
+        self._provider = MockProvider(self.provider_name)
+        self._rng = random.Random()
+
+    def name(self) -> str:
+        return self.provider_name
+
+    async def search(self, query: GroceryItem, location_pin: str | None) -> ProviderPrice | None:
+        delay_ms = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+        await asyncio.sleep(delay_ms / 1000)
+        return self._provider.search(query, location_pin)
+
+
+# Category axis of the batch pricing matrix ("general" covers uncatalogued items)
+PRICING_CATEGORIES: List[str] = sorted(
+    {data["category"] for data in MOCK_PRICE_DATABASE.values()} | {"general"}
+)
+
+
+@dataclass
+class PriceMatrix:
+    """Item x provider price grid for one PriceQuery (rows follow query order)"""
+    providers: List[str]
+    found: np.ndarray  # (items,) bool - item resolved to a catalog entry
+    categories: List[str]  # (items,)
+    category_multiplier: np.ndarray  # (items, providers)
+    original_price: np.ndarray  # (items, providers) before discount
+    discount_percent: np.ndarray  # (items, providers)
+    unit_price: np.ndarray  # (items, providers) unrounded discounted price
+    in_stock: np.ndarray  # (items,) bool
+    delivery_fee: np.ndarray  # (providers,)
+    eta_minutes: np.ndarray  # (items, providers) int
+
+
+class MockPricingEngine:
+    """
+    Batch pricing for MockProvider-backed scouts.
+
+    Computes the whole item x provider grid in one NumPy pass over arrays
+    precomputed from MOCK_PRICE_DATABASE and PLATFORM_STRATEGIES. Catalog
+    lookups and the per-item seed are resolved once per item instead of once
+    per (item, provider) cell, and the numbers match MockProvider.search.
+    """
+
+    def __init__(self, provider_names: Iterable[str]):
+        self.provider_names: List[str] = list(provider_names)
+        self.strategies = strategies = [
+            PLATFORM_STRATEGIES.get(name, PLATFORM_STRATEGIES["amazon_fresh"])
+            for name in self.provider_names
+        ]
+        self._category_index = {category: i for i, category in enumerate(PRICING_CATEGORIES)}
+        # (providers, categories)
+        self._category_multipliers = np.array(
+            [
+                [s["category_multipliers"].get(c, s["base_multiplier"]) for c in PRICING_CATEGORIES]
+                for s in strategies
+            ],
+            dtype=np.float64,
+        )
+        self._min_discount = np.array([s["discount_range"][0] for s in strategies], dtype=np.int64)
+        self._max_discount = np.array([s["discount_range"][1] for s in strategies], dtype=np.int64)
+        self._delivery_fee = np.array([s["delivery_fee"] for s in strategies], dtype=np.float64)
+        self._eta_ranges = [(s["eta_min"], s["eta_max"]) for s in strategies]
+
+    @classmethod
+    def for_providers(cls, providers: Iterable[ProviderAdapter]) -> MockPricingEngine | None:
+        """Build an engine when every provider is a MockProvider, else None"""
+        providers = list(providers)
+        if not providers or not all(isinstance(p, MockProvider) for p in providers):
+            return None
+        return cls(p.provider_name for p in providers)
+
+    def _draw(self, rng: random.Random, item_name: str) -> tuple[int, float, List[int]]:
+        """Replay the seeded draws MockProvider.search makes for an item"""
+        # search() seeds with the item hash, draws the discount variation and
+        # then the ETA; the stock check reseeds and reuses the first draw
+        item_hash = _item_hash(item_name)
+        rng.seed(item_hash)
+        first_draw = rng.random()
+        state = rng.getstate()
+        eta_by_range: Dict[tuple[int, int], int] = {}
+        for eta_range in self._eta_ranges:
+            if eta_range not in eta_by_range:
+                rng.setstate(state)
+                eta_by_range[eta_range] = rng.randint(*eta_range)
+        return item_hash, first_draw, [eta_by_range[r] for r in self._eta_ranges]
+
+    @traced("pricing.matrix", lambda self, items: {"items": len(items), "providers": len(self.provider_names)})
+    def price_matrix(self, items: List[GroceryItem]) -> PriceMatrix:
+        n_items, n_providers = len(items), len(self.provider_names)
+        base = np.full(n_items, np.nan, dtype=np.float64)
+        category_idx = np.empty(n_items, dtype=np.intp)
+        brand_factor = np.ones(n_items, dtype=np.float64)
+        seeds = np.zeros(n_items, dtype=np.int64)
+        variation = np.ones(n_items, dtype=np.float64)
+        in_stock = np.zeros(n_items, dtype=bool)
+        eta = np.zeros((n_items, n_providers), dtype=np.int64)
+        categories: List[str] = []
+
+        draws_by_name: Dict[str, tuple[int, float, List[int]]] = {}
+        rng = random.Random()
+        general = self._category_index["general"]
+
+        for row, item in enumerate(items):
+            category = MOCK_PRICE_DATABASE.get(item.name.lower(), {}).get("category", "general")
+            categories.append(category)
+            category_idx[row] = self._category_index.get(category, general)
+
+            base_price = _lookup_base_price(item.name)
+            if base_price is None:
+                continue
+            base[row] = base_price
+            if item.preferred_brand and len(item.preferred_brand) % 2 == 0:
+                brand_factor[row] = 0.9
+
+            if item.name not in draws_by_name:
+                draws_by_name[item.name] = self._draw(rng, item.name)
+            item_hash, first_draw, eta_row = draws_by_name[item.name]
+            seeds[row] = item_hash
+            variation[row] = 0.8 + (1.2 - 0.8) * first_draw
+            in_stock[row] = first_draw > 0.05
+            eta[row] = eta_row
+
+        category_multiplier = self._category_multipliers[:, category_idx].T
+        original = base[:, None] * category_multiplier
+        original = original * brand_factor[:, None]
+
+        spread = self._max_discount - self._min_discount + 1
+        discount = (self._min_discount[None, :] + seeds[:, None] % spread[None, :]) * variation[:, None]
+        discount = np.minimum(self._max_discount, np.maximum(self._min_discount, discount))
+
+        return PriceMatrix(
+            providers=self.provider_names,
+            found=~np.isnan(base),
+            categories=categories,
+            category_multiplier=category_multiplier,
+            original_price=original,
+            discount_percent=discount,
+            unit_price=original * (1 - discount / 100),
+            in_stock=in_stock,
+            delivery_fee=self._delivery_fee,
+            eta_minutes=eta,
+        )
+
+
+def _item_key(item: GroceryItem) -> str:
+    return f"{item.name}_{item.quantity}_{item.unit}"
+
+
+def _display_name(platform: str) -> str:
+    return platform.replace('_', ' ').title()
+
+
+class PriceAnalysis:
+    """
+    Analysis context for one PriceQuery, built from a single aggregation pass.
+
+    Holds the provider prices found for every item; the frontend PriceResult
+    and the derived views (platform comparison, best deals, category
+    breakdown, platform strengths, recommendations) are computed from them on
+    first access, so one analysis can serve several endpoints.
+    """
+
+    def __init__(
+        self,
+        query: PriceQuery,
+        item_prices: Dict[str, List[ProviderPrice]],
+        late_results: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.query = query
+        self.item_prices = item_prices
+        # provider -> item names left out because they missed the deadline
+        self.late_results = late_results or {}
+
+    @cached_property
+    def prices(self) -> List[ProviderPrice]:
+        """All provider prices, in query order"""
+        return [
+            price
+            for item in self.query.items
+            for price in self.item_prices.get(_item_key(item), [])
+        ]
+
+    def prices_for(self, item: GroceryItem) -> List[ProviderPrice]:
+        """Provider prices found for one of the query's items"""
+        return self.item_prices.get(_item_key(item), [])
+
+    @property
+    def items(self) -> List[PriceResultItem]:
+        return self.result.items
+
+    @cached_property
+    def result(self) -> PriceResult:
+        """Frontend price comparison for the query"""
         result_items: List[PriceResultItem] = []
         total_savings = 0.0
         best_platform = ""
         platform_totals: Dict[str, float] = {}
-        
-        for item in query.items:
-            item_key = f"{item.name}_{item.quantity}_{item.unit}"
-            prices = item_results.get(item_key, [])
-            
+
+        for item in self.query.items:
+            prices = self.item_prices.get(_item_key(item), [])
+
             if not prices:
                 continue
-                
+
             # Convert ProviderPrice to PlatformPrice
             platforms = []
             for price in prices:
-                platform_price = PlatformPrice(
+                platform_price = PlatformPrice.model_construct(
                     platform=price.provider,
                     price=price.unit_price,
                     discount=float(price.metadata.get("discount", 0)),
@@ -415,12 +645,12 @@ class DealScoutAgent:
                     stock_available=price.in_stock
                 )
                 platforms.append(platform_price)
-                
+
                 # Track platform totals
                 if price.provider not in platform_totals:
                     platform_totals[price.provider] = 0
                 platform_totals[price.provider] += price.unit_price
-            
+
             # Build the price result for this item
             result_item = PriceResultItem(
                 name=item.name,
@@ -430,35 +660,34 @@ class DealScoutAgent:
                 platforms=platforms
             )
             result_items.append(result_item)
-        
+
         # Find best platform (lowest total)
         if platform_totals:
             best_platform = min(platform_totals.keys(), key=lambda k: platform_totals[k])
             # Calculate total savings (simplified)
             total_savings = max(platform_totals.values()) - min(platform_totals.values())
-        
+
         # Generate recommendations
         recommendations = [
             f"Best overall platform: {best_platform}",
             f"Total potential savings: ₹{total_savings:.2f}",
             "Consider bulk purchases for better deals"
         ]
-        
+
         return PriceResult(
             items=result_items,
             total_savings=total_savings,
             best_platform=best_platform,
             recommendations=recommendations,
-            aggregated_at=datetime.utcnow().isoformat()
+            aggregated_at=datetime.utcnow().isoformat(),
+            late_results=self.late_results,
         )
 
-    def get_platform_comparison(self, query: PriceQuery) -> Dict[str, Dict]:
-        """Get detailed comparison across all platforms"""
-        results = self.aggregate_prices(query)
-        
-        # Group by platform
+    @cached_property
+    def platform_comparison(self) -> Dict[str, Dict]:
+        """Detailed comparison across all platforms"""
         platform_data = {}
-        for price in results.items:
+        for price in self.prices:
             platform = price.provider
             if platform not in platform_data:
                 platform_data[platform] = {
@@ -470,106 +699,38 @@ class DealScoutAgent:
                     "in_stock_items": 0,
                     "total_items": 0
                 }
-            
+
             platform_data[platform]["items"].append(price)
             platform_data[platform]["total_cost"] += price.unit_price
             platform_data[platform]["total_items"] += 1
-            
+
             if price.in_stock:
                 platform_data[platform]["in_stock_items"] += 1
-            
+
             # Calculate savings from original price
             original_price = price.metadata.get("original_price", price.unit_price)
             savings = original_price - price.unit_price
             platform_data[platform]["total_savings"] += savings
-        
+
         return platform_data
 
-    def get_best_deals(self, query: PriceQuery) -> Dict[str, List[ProviderPrice]]:
-        """Get best deals for each item across platforms"""
-        results = self.aggregate_prices(query)
-        
-        # Group by item name
+    @cached_property
+    def best_deals(self) -> Dict[str, List[ProviderPrice]]:
+        """Best deals for each item across platforms, cheapest first"""
         item_deals = {}
-        for price in results.items:
-            item_name = price.item_name
-            if item_name not in item_deals:
-                item_deals[item_name] = []
-            item_deals[item_name].append(price)
-        
-        # Sort by price for each item
+        for price in self.prices:
+            item_deals.setdefault(price.item_name, []).append(price)
+
         for item_name in item_deals:
             item_deals[item_name].sort(key=lambda x: x.unit_price)
-        
-        return item_deals
 
-    def get_recommendations(self, query: PriceQuery) -> List[str]:
-        """Generate smart recommendations based on price analysis"""
-        platform_data = self.get_platform_comparison(query)
-        best_deals = self.get_best_deals(query)
-        
-        recommendations = []
-        
-        # Find cheapest platform overall
-        cheapest_platform = min(platform_data.items(), 
-                               key=lambda x: x[1]["total_cost"] + x[1]["delivery_fee"])
-        recommendations.append(f"💰 Best overall value: {cheapest_platform[0].replace('_', ' ').title()} "
-                             f"(₹{cheapest_platform[1]['total_cost'] + cheapest_platform[1]['delivery_fee']:.2f})")
-        
-        # Find fastest delivery
-        fastest_platform = min(platform_data.items(), 
-                              key=lambda x: x[1]["delivery_time"])
-        recommendations.append(f"⚡ Fastest delivery: {fastest_platform[0].replace('_', ' ').title()} "
-                             f"({fastest_platform[1]['delivery_time']} minutes)")
-        
-        # Check for significant savings
-        max_savings = max(platform_data.items(), key=lambda x: x[1]["total_savings"])
-        if max_savings[1]["total_savings"] > 50:
-            recommendations.append(f"🎯 Maximum savings: {max_savings[0].replace('_', ' ').title()} "
-                                 f"(₹{max_savings[1]['total_savings']:.2f} off)")
-        
-        # Check stock availability
-        for platform, data in platform_data.items():
-            stock_ratio = data["in_stock_items"] / data["total_items"]
-            if stock_ratio < 0.8:
-                recommendations.append(f"⚠️ Limited stock on {platform.replace('_', ' ').title()} "
-                                     f"({data['in_stock_items']}/{data['total_items']} items available)")
-        
-        # Category-specific recommendations
-        category_analysis = self._analyze_categories(query)
-        for category, analysis in category_analysis.items():
-            if analysis["best_platform"]:
-                platform_name = analysis["best_platform"].replace('_', ' ').title()
-                savings = analysis["savings_vs_avg"]
-                if savings > 10:
-                    recommendations.append(f"🏷️ Best for {category}: {platform_name} "
-                                         f"(₹{savings:.2f} cheaper than average)")
-        
-        # Platform strength recommendations
-        platform_strengths = self._get_platform_strengths(query)
-        for platform, strength_score in platform_strengths.items():
-            if strength_score > 0.7:  # High strength
-                platform_name = platform.replace('_', ' ').title()
-                strategy = PLATFORM_STRATEGIES.get(platform, {})
-                strengths = strategy.get("strengths", [])
-                if strengths:
-                    strength_categories = ", ".join(strengths)
-                    recommendations.append(f"⭐ {platform_name} excels in: {strength_categories}")
-        
-        # Suggest mixed cart if beneficial
-        total_items = len(query.items)
-        if total_items > 3:
-            recommendations.append("🛒 Consider splitting your order across platforms for maximum savings")
-        
-        return recommendations
+        return item_deals
 
-    def _analyze_categories(self, query: PriceQuery) -> Dict[str, Dict]:
-        """Analyze pricing by category"""
-        results = self.aggregate_prices(query)
-        
-        # Group by category
+    @cached_property
+    def category_analysis(self) -> Dict[str, Dict]:
+        """Pricing broken down by category"""
         category_data = {}
-        for price in results.items:
+        for price in self.prices:
             category = price.metadata.get("category", "general")
             if category not in category_data:
                 category_data[category] = {
@@ -577,12 +738,11 @@ class DealScoutAgent:
                     "platforms": set(),
                     "total_items": 0
                 }
-            
+
             category_data[category]["prices"].append(price)
             category_data[category]["platforms"].add(price.provider)
             category_data[category]["total_items"] += 1
-        
-        # Analyze each category
+
         category_analysis = {}
         for category, data in category_data.items():
             if data["prices"]:
@@ -593,12 +753,12 @@ class DealScoutAgent:
                     if platform not in platform_totals:
                         platform_totals[platform] = 0
                     platform_totals[platform] += price.unit_price
-                
+
                 best_platform = min(platform_totals.items(), key=lambda x: x[1])[0]
                 avg_price = sum(platform_totals.values()) / len(platform_totals)
                 best_price = platform_totals[best_platform]
                 savings = avg_price - best_price
-                
+
                 category_analysis[category] = {
                     "best_platform": best_platform,
                     "best_price": best_price,
@@ -606,29 +766,326 @@ class DealScoutAgent:
                     "savings_vs_avg": savings,
                     "total_items": data["total_items"]
                 }
-        
+
         return category_analysis
 
-    def _get_platform_strengths(self, query: PriceQuery) -> Dict[str, float]:
-        """Calculate platform strength scores based on item categories"""
-        results = self.aggregate_prices(query)
-        
-        # Get unique categories in the query
+    @cached_property
+    def platform_strengths(self) -> Dict[str, float]:
+        """Platform strength scores based on the query's item categories"""
         query_categories = set()
-        for item in query.items:
+        for item in self.query.items:
             item_data = MOCK_PRICE_DATABASE.get(item.name.lower(), {})
-            category = item_data.get("category", "general")
-            query_categories.add(category)
-        
+            query_categories.add(item_data.get("category", "general"))
+
         platform_strengths = {}
         for platform, strategy in PLATFORM_STRATEGIES.items():
-            platform_strengths[platform] = strategy["base_multiplier"]
             strengths = strategy.get("strengths", [])
-            
-            # Calculate strength score based on how many query categories match platform strengths
+
+            # Share of the query's categories that match the platform strengths
             matching_categories = len(query_categories.intersection(set(strengths)))
             strength_score = matching_categories / len(query_categories) if query_categories else 0
-            
+
             platform_strengths[platform] = strength_score
-        
+
         return platform_strengths
+
+    @cached_property
+    def recommendations(self) -> List[str]:
+        """Smart recommendations based on the price analysis"""
+        platform_data = self.platform_comparison
+        recommendations = []
+
+        if not platform_data:
+            return recommendations
+
+        # Find cheapest platform overall
+        cheapest_platform = min(platform_data.items(),
+                               key=lambda x: x[1]["total_cost"] + x[1]["delivery_fee"])
+        recommendations.append(f"💰 Best overall value: {_display_name(cheapest_platform[0])} "
+                             f"(₹{cheapest_platform[1]['total_cost'] + cheapest_platform[1]['delivery_fee']:.2f})")
+
+        # Find fastest delivery
+        fastest_platform = min(platform_data.items(),
+                              key=lambda x: x[1]["delivery_time"] or 0)
+        recommendations.append(f"⚡ Fastest delivery: {_display_name(fastest_platform[0])} "
+                             f"({fastest_platform[1]['delivery_time']} minutes)")
+
+        # Check for significant savings
+        max_savings = max(platform_data.items(), key=lambda x: x[1]["total_savings"])
+        if max_savings[1]["total_savings"] > 50:
+            recommendations.append(f"🎯 Maximum savings: {_display_name(max_savings[0])} "
+                                 f"(₹{max_savings[1]['total_savings']:.2f} off)")
+
+        # Check stock availability
+        for platform, data in platform_data.items():
+            stock_ratio = data["in_stock_items"] / data["total_items"]
+            if stock_ratio < 0.8:
+                recommendations.append(f"⚠️ Limited stock on {_display_name(platform)} "
+                                     f"({data['in_stock_items']}/{data['total_items']} items available)")
+
+        # Category-specific recommendations
+        for category, analysis in self.category_analysis.items():
+            if analysis["best_platform"]:
+                savings = analysis["savings_vs_avg"]
+                if savings > 10:
+                    recommendations.append(f"🏷️ Best for {category}: {_display_name(analysis['best_platform'])} "
+                                         f"(₹{savings:.2f} cheaper than average)")
+
+        # Platform strength recommendations
+        for platform, strength_score in self.platform_strengths.items():
+            if strength_score > 0.7:  # High strength
+                strengths = PLATFORM_STRATEGIES.get(platform, {}).get("strengths", [])
+                if strengths:
+                    recommendations.append(f"⭐ {_display_name(platform)} excels in: {', '.join(strengths)}")
+
+        # Suggest mixed cart if beneficial
+        if len(self.query.items) > 3:
+            recommendations.append("🛒 Consider splitting your order across platforms for maximum savings")
+
+        return recommendations
+
+
+class DealScoutAgent:
+    def __init__(
+        self,
+        providers: Iterable[ProviderAdapter | AsyncProviderAdapter],
+        cache: TieredCache[CachedPricing] | None = None,
+    ):
+        self.providers: List[ProviderAdapter | AsyncProviderAdapter] = list(providers)
+        # Batch mode is only available when every provider is a MockProvider
+        self._pricing_engine = MockPricingEngine.for_providers(self.providers)
+        # Mock and snapshot-backed prices are pure CPU work, nothing to overlap
+        self._in_memory = self._pricing_engine is not None or (
+            bool(self.providers) and all(isinstance(p, CatalogProvider) for p in self.providers)
+        )
+        # Optional result cache consulted by analyze_async
+        self.cache = cache
+
+    def _search_prices(self, query: PriceQuery) -> Dict[str, List[ProviderPrice]]:
+        """Query each provider for each item, one search call per cell"""
+        item_prices: Dict[str, List[ProviderPrice]] = {}
+
+        for item in query.items:
+            item_key = _item_key(item)
+            item_prices[item_key] = []
+
+            for provider in self.providers:
+                price = provider.search(item, query.location_pin)
+                if price:
+                    item_prices[item_key].append(price)
+
+        return item_prices
+
+    def _price_batch(self, query: PriceQuery) -> Dict[str, List[ProviderPrice]]:
+        """Price the whole query from one MockPricingEngine matrix"""
+        engine = self._pricing_engine
+        matrix = engine.price_matrix(query.items)
+        with span("scout.materialize", items=len(query.items)):
+            return self._materialize(engine, matrix, query)
+
+    def _materialize(self, engine: MockPricingEngine, matrix: PriceMatrix, query: PriceQuery) -> Dict[str, List[ProviderPrice]]:
+        """ProviderPrice objects for every found cell of the matrix"""
+        unit_prices = matrix.unit_price.tolist()
+        original_prices = matrix.original_price.tolist()
+        discounts = matrix.discount_percent.tolist()
+        multipliers = matrix.category_multiplier.tolist()
+        etas = matrix.eta_minutes.tolist()
+        fees = matrix.delivery_fee.tolist()
+        found = matrix.found.tolist()
+        in_stock = matrix.in_stock.tolist()
+
+        item_prices: Dict[str, List[ProviderPrice]] = {}
+        for row, item in enumerate(query.items):
+            prices: List[ProviderPrice] = []
+            if found[row]:
+                slug = item.name.replace(' ', '-')
+                for col, provider in enumerate(matrix.providers):
+                    strategy = engine.strategies[col]
+                    min_discount, max_discount = strategy["discount_range"]
+                    discount = discounts[row][col]
+                    if not min_discount < discount < max_discount:
+                        # search() clamps to the integer bounds of the range
+                        discount = int(discount)
+                    prices.append(ProviderPrice.model_construct(
+                        provider=provider,
+                        item_name=item.name,
+                        unit_price=round(unit_prices[row][col], 2),
+                        currency="INR",
+                        in_stock=in_stock[row],
+                        delivery_fee=fees[col],
+                        delivery_eta_minutes=etas[row][col],
+                        url=f"https://{provider.replace('_', '')}.com/product/{slug}",
+                        metadata={
+                            "mock": "true",
+                            "original_price": round(original_prices[row][col], 2),
+                            "discount_percent": round(discount, 1),
+                            "category": matrix.categories[row],
+                            "category_multiplier": round(multipliers[row][col], 3),
+                            "base_multiplier": strategy["base_multiplier"],
+                            "min_order": strategy["min_order"],
+                            "platform_strategy": provider,
+                            "platform_strengths": strategy.get("strengths", []),
+                        },
+                    ))
+            item_prices[_item_key(item)] = prices
+
+        return item_prices
+
+    async def _search_prices_async(
+        self,
+        query: PriceQuery,
+        timeout_seconds: float,
+        max_concurrency: int,
+        provider_timeouts: Dict[str, float],
+    ) -> tuple[Dict[str, List[ProviderPrice]], Dict[str, List[str]]]:
+        """Query every provider for every item concurrently, under per-provider deadlines"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        deadlines = {
+            provider.name(): started + provider_timeouts.get(provider.name(), timeout_seconds)
+            for provider in self.providers
+        }
+
+        async def search(provider, item: GroceryItem) -> ProviderPrice | None:
+            # Time spent queued behind the concurrency limit counts against
+            # the provider deadline
+            async with semaphore:
+                remaining = deadlines[provider.name()] - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                if inspect.iscoroutinefunction(provider.search):
+                    call = provider.search(item, query.location_pin)
+                else:
+                    call = asyncio.to_thread(provider.search, item, query.location_pin)
+                return await asyncio.wait_for(call, remaining)
+
+        cells = [(item, provider) for item in query.items for provider in self.providers]
+        with span("scout.fan_out", cells=len(cells)):
+            results = await asyncio.gather(
+                *(search(provider, item) for item, provider in cells),
+                return_exceptions=True,
+            )
+
+        item_prices: Dict[str, List[ProviderPrice]] = {}
+        late_results: Dict[str, List[str]] = {}
+        for cell, (item, provider) in enumerate(cells):
+            item_key = _item_key(item)
+            if cell % len(self.providers) == 0:
+                item_prices[item_key] = []
+            price = results[cell]
+            if isinstance(price, asyncio.TimeoutError):
+                late_results.setdefault(provider.name(), []).append(item.name)
+            elif isinstance(price, BaseException):
+                raise price
+            elif price:
+                item_prices[item_key].append(price)
+
+        return item_prices, late_results
+
+    async def analyze_async(
+        self,
+        query: PriceQuery,
+        timeout_seconds: float | None = None,
+        max_concurrency: int | None = None,
+        provider_timeouts: Dict[str, float] | None = None,
+    ) -> PriceAnalysis:
+        """
+        Async counterpart of analyze() for I/O-bound provider adapters.
+
+        All (item, provider) searches run concurrently with at most
+        max_concurrency in flight. Each provider gets a deadline of
+        timeout_seconds (or its entry in provider_timeouts) from the start of
+        the pass; searches that miss it are left out and listed in
+        late_results. Sync adapters run in worker threads.
+
+        With a cache configured, results are shared between queries with the
+        same canonical key (see price_query_key); partial results are not
+        cached.
+        """
+        with span("scout.analyze_async", items=len(query.items), providers=len(self.providers)):
+            if self.cache is None:
+                return await self._analyze_async(query, timeout_seconds, max_concurrency, provider_timeouts)
+            return await self._analyze_cached(query, timeout_seconds, max_concurrency, provider_timeouts)
+
+    async def _analyze_cached(
+        self,
+        query: PriceQuery,
+        timeout_seconds: float | None,
+        max_concurrency: int | None,
+        provider_timeouts: Dict[str, float] | None,
+    ) -> PriceAnalysis:
+        async def compute() -> CachedPricing:
+            analysis = await self._analyze_async(query, timeout_seconds, max_concurrency, provider_timeouts)
+            return {
+                "prices": {
+                    item_ident(item): analysis.item_prices.get(_item_key(item), [])
+                    for item in query.items
+                },
+                "late_results": analysis.late_results,
+            }
+
+        pricing = await self.cache.get_or_compute(
+            price_query_key(query, (provider.name() for provider in self.providers)),
+            compute,
+            should_cache=lambda pricing: not pricing["late_results"],
+        )
+        item_prices = {_item_key(item): prices_for_item(pricing, item) for item in query.items}
+        return PriceAnalysis(query, item_prices, pricing["late_results"])
+
+    async def _analyze_async(
+        self,
+        query: PriceQuery,
+        timeout_seconds: float | None,
+        max_concurrency: int | None,
+        provider_timeouts: Dict[str, float] | None,
+    ) -> PriceAnalysis:
+        if self._in_memory:
+            return self.analyze(query)
+        if not self.providers:
+            return PriceAnalysis(query, {})
+
+        item_prices, late_results = await self._search_prices_async(
+            query,
+            timeout_seconds if timeout_seconds is not None else settings.provider_timeout_seconds,
+            max_concurrency or settings.provider_max_concurrency,
+            provider_timeouts or {},
+        )
+        return PriceAnalysis(query, item_prices, late_results)
+
+    async def aggregate_prices_async(self, query: PriceQuery, **kwargs) -> PriceResult:
+        analysis = await self.analyze_async(query, **kwargs)
+        return analysis.result
+
+    def analyze(self, query: PriceQuery) -> PriceAnalysis:
+        """Run one aggregation pass and return the shared analysis context"""
+        batch = self._pricing_engine is not None
+        with span("scout.analyze", items=len(query.items), providers=len(self.providers), batch=batch):
+            if batch:
+                item_prices = self._price_batch(query)
+            else:
+                item_prices = self._search_prices(query)
+            return PriceAnalysis(query, item_prices)
+
+    def aggregate_prices(self, query: PriceQuery) -> PriceResult:
+        return self.analyze(query).result
+
+    def get_platform_comparison(self, query: PriceQuery) -> Dict[str, Dict]:
+        """Get detailed comparison across all platforms"""
+        return self.analyze(query).platform_comparison
+
+    def get_best_deals(self, query: PriceQuery) -> Dict[str, List[ProviderPrice]]:
+        """Get best deals for each item across platforms"""
+        return self.analyze(query).best_deals
+
+    def get_recommendations(self, query: PriceQuery) -> List[str]:
+        """Generate smart recommendations based on price analysis"""
+        return self.analyze(query).recommendations
+
+    def _analyze_categories(self, query: PriceQuery) -> Dict[str, Dict]:
+        """Analyze pricing by category"""
+        return self.analyze(query).category_analysis
+
+    def _get_platform_strengths(self, query: PriceQuery) -> Dict[str, float]:
+        """Calculate platform strength scores based on item categories"""
+        return self.analyze(query).platform_strengths
@@ -1,14 +1,28 @@
 from __future__ import annotations
 
 import math
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Tuple
 from ..schemas.groceries import ProviderPrice, CartOption, CartPlan
+from ..tracing import traced
+from .cart_solver import solve_mixed_carts
+from .cart_store import Cart, CartItem, LineUpdate, get_cart_store
+
+
+def _meets_min_order(option: CartOption) -> bool:
+    """Every provider in the option reaches its minimum order (metadata "min_order")"""
+    subtotals: Dict[str, float] = {}
+    min_orders: Dict[str, float] = {}
+    for item in option.items:
+        subtotals[item.provider] = subtotals.get(item.provider, 0.0) + item.unit_price
+        min_orders[item.provider] = float(item.metadata.get("min_order", 0) or 0)
+    return all(subtotals[provider] >= min_orders[provider] - 1e-9 for provider in subtotals)
 
 
 class CartBuilderAgent:
     def __init__(self):
         pass
 
+    @traced("cart.build", lambda self, prices: {"prices": len(prices)})
     def build_cart(self, prices: List[ProviderPrice]) -> CartPlan:
         # Strategy 1: Single-provider per provider
         options: List[CartOption] = []
@@ -31,52 +45,60 @@ class CartBuilderAgent:
                 )
             )
 
-        # Strategy 2: Split across two cheapest providers per item (approximation)
-        # Using a simple approach to show how mixed carts could work
-        cheapest_by_item: Dict[str, ProviderPrice] = {}
-        for p in prices:
-            key = f"{p.item_name}"
-            if key not in cheapest_by_item or p.unit_price < cheapest_by_item[key].unit_price:
-                cheapest_by_item[key] = p
-
-        if cheapest_by_item:
-            grouped: Dict[str, List[ProviderPrice]] = {}
-            for v in cheapest_by_item.values():
-                grouped.setdefault(v.provider, []).append(v)
-            subtotal = sum(v.unit_price for v in cheapest_by_item.values())
-            # Sum distinct provider delivery fees
-            delivery_fee = sum(next((x.delivery_fee for x in prices if x.provider == prov), 0.0) for prov in grouped.keys())
-            eta = max((v.delivery_eta_minutes or 0 for v in cheapest_by_item.values()), default=0)
+        # Strategy 2: Mixed carts from the exact solver, one per point on the
+        # cost vs. ETA Pareto front (single-provider points are covered above)
+        front = solve_mixed_carts(prices)
+        for cart in front:
+            if len(cart.providers) < 2:
+                continue
             options.append(
                 CartOption(
                     provider="mixed",
-                    items=list(cheapest_by_item.values()),
-                    subtotal=round(subtotal, 2),
-                    delivery_fee=round(delivery_fee, 2),
-                    total=round(subtotal + delivery_fee, 2),
-                    est_delivery_minutes=eta,
+                    items=cart.items,
+                    subtotal=cart.subtotal,
+                    delivery_fee=cart.delivery_fee,
+                    total=cart.total,
+                    est_delivery_minutes=cart.eta_minutes,
+                    metadata={"exact": cart.exact},
                 )
             )
 
-        # Choose best option by total, tie-breaker by ETA
-        best_idx = 0
-        for idx in range(1, len(options)):
+        # Choose best option by total, tie-breaker by ETA. Carts below a
+        # provider's minimum order cannot be placed, so only fall back to
+        # them when nothing meets its minimum.
+        eligible = [idx for idx, option in enumerate(options) if _meets_min_order(option)] or list(range(len(options)))
+        best_idx = eligible[0] if eligible else 0
+        for idx in eligible[1:]:
             a = options[idx]
             b = options[best_idx]
             if a.total < b.total or (math.isclose(a.total, b.total) and (a.est_delivery_minutes or 0) < (b.est_delivery_minutes or 0)):
                 best_idx = idx
 
-        return CartPlan(options=options, best_option_index=best_idx)
+        notes = None
+        if len(front) > 1:
+            notes = "Cost vs. delivery time trade-offs: " + ", ".join(
+                f"{'+'.join(cart.providers)} ₹{cart.total:.2f} in {cart.eta_minutes}min{'' if cart.exact else ' (best found)'}"
+                for cart in front
+            )
+        return CartPlan(options=options, best_option_index=best_idx, notes=notes)
 
-CartItem = Dict[str, Any]  # { id, provider, item_name, unit_price, delivery_fee, qty, metadata }
 
-_CART_STORE: Dict[str, List[CartItem]] = {}
+def _line(price: ProviderPrice, qty: int) -> CartItem:
+    return {
+        "id": f"{price.provider}:{price.item_name}",
+        "provider": price.provider,
+        "item_name": price.item_name,
+        "unit_price": float(price.unit_price),
+        "delivery_fee": float(price.delivery_fee or 0.0),
+        "qty": int(qty),
+        "metadata": price.metadata or {},
+    }
 
 
-def _ensure_user(user_id: str) -> List[CartItem]:
-    if user_id not in _CART_STORE:
-        _CART_STORE[user_id] = []
-    return _CART_STORE[user_id]
+def _line_update(price: ProviderPrice, qty: int) -> LineUpdate:
+    """Add, update or (qty <= 0) remove the cart line for price"""
+    line = _line(price, qty)
+    return line["id"], (line if qty > 0 else None)
 
 
 def cart_add_or_update(user_id: str, price: ProviderPrice, qty: int = 1) -> Dict[str, Any]:
@@ -84,65 +106,37 @@ def cart_add_or_update(user_id: str, price: ProviderPrice, qty: int = 1) -> Dict
     Add or update a cart line for the given user. Dedupe by (provider,item_name).
     qty <= 0 will remove the line.
     """
-    cart = _ensure_user(user_id)
-    line_id = f"{price.provider}:{price.item_name}"
-    existing = next((c for c in cart if c["id"] == line_id), None)
-    if qty <= 0:
-        if existing:
-            cart.remove(existing)
-        return cart_summary(user_id)
-
-    payload: CartItem = {
-        "id": line_id,
-        "provider": price.provider,
-        "item_name": price.item_name,
-        "unit_price": float(price.unit_price),
-        "delivery_fee": float(price.delivery_fee or 0.0),
-        "qty": int(qty),
-        "metadata": price.metadata or {},
-    }
+    return _summarize(get_cart_store().apply(user_id, [_line_update(price, qty)]))
 
-    if existing:
-        # Preserve existing delivery_fee if incoming payload does not specify a meaningful value
-        if not payload.get("delivery_fee"):
-            payload["delivery_fee"] = existing.get("delivery_fee", 0.0)
-        existing.update(payload)
-    else:
-        cart.append(payload)
-    return cart_summary(user_id)
+
+def cart_add_many(user_id: str, lines: Iterable[Tuple[ProviderPrice, int]]) -> Dict[str, Any]:
+    """Apply several (price, qty) line updates as one bulk write, then summarize once."""
+    updates = [_line_update(price, qty) for price, qty in lines]
+    return _summarize(get_cart_store().apply(user_id, updates))
 
 
 def cart_remove(user_id: str, line_id: str) -> Dict[str, Any]:
-    cart = _ensure_user(user_id)
-    item = next((c for c in cart if c["id"] == line_id), None)
-    if item:
-        cart.remove(item)
-    return cart_summary(user_id)
+    return _summarize(get_cart_store().apply(user_id, [(line_id, None)]))
 
 
 def cart_clear(user_id: str) -> Dict[str, Any]:
-    _CART_STORE[user_id] = []
-    return cart_summary(user_id)
+    get_cart_store().clear(user_id)
+    return _summarize(Cart())
 
 
-def cart_summary(user_id: str) -> Dict[str, Any]:
-    cart = _ensure_user(user_id)
-    subtotal = sum(c["unit_price"] * c.get("qty", 1) for c in cart)
-    # Delivery fee: one per unique provider present in cart
-    unique_providers = {}
-    for c in cart:
-        if c["provider"] not in unique_providers:
-            unique_providers[c["provider"]] = c.get("delivery_fee", 0.0)
-    delivery = sum(unique_providers.values())
-    total = subtotal + delivery
+def _summarize(cart: Cart) -> Dict[str, Any]:
     return {
-        "items": cart,
-        "subtotal": round(subtotal, 2),
-        "delivery": round(delivery, 2),
-        "total": round(total, 2),
+        "items": list(cart.lines.values()),
+        "subtotal": round(cart.subtotal, 2),
+        "delivery": round(cart.delivery, 2),
+        "total": round(cart.subtotal + cart.delivery, 2),
     }
 
 
+def cart_summary(user_id: str) -> Dict[str, Any]:
+    return _summarize(get_cart_store().cart(user_id))
+
+
 def cart_get(user_id: str) -> Dict[str, Any]:
     """Return current cart for the user without modifying it."""
     return cart_summary(user_id)
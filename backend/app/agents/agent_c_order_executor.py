@@ -4,6 +4,7 @@ from typing import List, Dict, Any
 from datetime import datetime
 from ..schemas.groceries import ProviderPrice, CheckoutRequest, CheckoutResponse
 from ..security.rbac import check_grocery_delegation
+from ..tracing import traced
 
 
 class OrderExecutorAgent:
@@ -23,6 +24,7 @@ class OrderExecutorAgent:
         # In production: validate JWT token, check user session, verify payment token
         return True  # Mock successful authentication
 
+    @traced("checkout.coupons")
     def _apply_coupons(self, subtotal: float, coupon_codes: List[str]) -> Dict[str, Any]:
         """Apply valid coupon codes and calculate discounts"""
         total_discount = 0.0
@@ -51,6 +53,7 @@ class OrderExecutorAgent:
             "invalid_coupons": invalid_coupons
         }
 
+    @traced("checkout.loyalty")
     def _apply_loyalty_points(self, user_id: str, subtotal: float) -> Dict[str, Any]:
         """Apply user's loyalty points to the order"""
         # Mock loyalty points - in production, fetch from user's account
@@ -157,6 +160,7 @@ class OrderExecutorAgent:
 
         return recommendations
 
+    @traced("checkout", lambda self, req, user_role="shopper": {"provider": req.provider, "items": len(req.items)})
     def checkout(self, req: CheckoutRequest, user_role: str = "shopper") -> CheckoutResponse:
         """Execute the grocery order with secure authentication and preference learning"""
         # Simulate secure authentication
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Deque, Optional, Tuple
+import asyncio
+import time
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -14,10 +16,12 @@ from ..schemas.groceries import (
     CheckoutRequest,
     CheckoutResponse,
 )
-from .agent_a_deal_scout import DealScoutAgent, MockProvider
-from .agent_b_cart_builder import CartBuilderAgent
-from .agent_c_order_executor import OrderExecutorAgent
-from ..security.rbac import check_grocery_delegation
+from .agent_a_deal_scout import DealScoutAgent, MockProvider, PriceAnalysis, ProviderAdapter, _item_key
+from .deal_catalog import deal_catalog, use_deal_catalog
+from ..config import settings
+from ..metrics import MetricsRegistry, metrics_registry
+from ..tracing import Span, span, start_trace
+from .workflow_checkpoints import STAGES, Checkpoint, WorkflowBusy, dump_scout, get_checkpoint_store, new_checkpoint
 
 
 @dataclass
@@ -41,6 +45,9 @@ class WorkflowResult:
     total_cost_savings: float = 0.0
     recommendations: List[str] = None
     errors: List[str] = None
+    spans: Optional[List[Span]] = None  # only when the workflow ran with trace=True
+    workflow_id: Optional[str] = None  # checkpoint id, for get_workflow / retry_failed_workflow
+    insights: Optional[Dict[str, Any]] = None  # category_analysis, platform_strengths, recommendations
 
 
 class OverseerAgent:
@@ -55,23 +62,27 @@ class OverseerAgent:
     5. Make strategic decisions about workflow optimization
     """
     
-    def __init__(self):
-        self.workflow_history: List[Dict[str, Any]] = []
-        self.agent_performance_history: Dict[str, List[AgentMetrics]] = {
-            "DealScoutAgent": [],
-            "CartBuilderAgent": [],
-            "OrderExecutorAgent": []
-        }
-        self.workflow_stats = {
-            "total_workflows": 0,
-            "successful_workflows": 0,
-            "failed_workflows": 0,
-            "total_cost_savings": 0.0,
-            "avg_execution_time": 0.0
-        }
-        
-    def _build_default_providers(self) -> List[MockProvider]:
+    def __init__(self, metrics: Optional[MetricsRegistry] = None):
+        # Shared by every OverseerAgent in the process unless one is passed in
+        self.metrics = metrics or metrics_registry
+
+    @property
+    def workflow_history(self) -> Deque[Dict[str, Any]]:
+        return self.metrics.workflow_history
+
+    @property
+    def agent_performance_history(self) -> Dict[str, Deque[AgentMetrics]]:
+        """Most recent runs per agent (ring buffers)"""
+        return {name: stats.recent for name, stats in self.metrics.agent_stats.items()}
+
+    @property
+    def workflow_stats(self) -> Dict[str, Any]:
+        return self.metrics.workflow_stats
+
+    def _build_default_providers(self) -> List[ProviderAdapter]:
         """Build default grocery platform providers"""
+        if use_deal_catalog():
+            return deal_catalog.providers()
         return [
             MockProvider("amazon_fresh", base_price_multiplier=1.00, delivery_fee=0, eta_minutes=90),
             MockProvider("instacart", base_price_multiplier=1.02, delivery_fee=35, eta_minutes=120),
@@ -80,11 +91,12 @@ class OverseerAgent:
     
     def _execute_with_monitoring(self, agent_name: str, func, *args, **kwargs) -> tuple[Any, AgentMetrics]:
         """Execute an agent function with performance monitoring"""
-        start_time = datetime.utcnow()
+        start_ns = time.perf_counter_ns()
         
         try:
-            result = func(*args, **kwargs)
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            with span(agent_name):
+                result = func(*args, **kwargs)
+            execution_time = (time.perf_counter_ns() - start_ns) / 1e6
             
             metrics = AgentMetrics(
                 agent_name=agent_name,
@@ -92,11 +104,12 @@ class OverseerAgent:
                 success=True,
                 items_processed=len(result.items) if hasattr(result, 'items') else 0
             )
+            self.metrics.record_agent(metrics)
             
             return result, metrics
             
         except Exception as e:
-            execution_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            execution_time = (time.perf_counter_ns() - start_ns) / 1e6
             
             metrics = AgentMetrics(
                 agent_name=agent_name,
@@ -104,6 +117,7 @@ class OverseerAgent:
                 success=False,
                 error_message=str(e)
             )
+            self.metrics.record_agent(metrics)
             
             raise e
     
@@ -137,7 +151,9 @@ class OverseerAgent:
             return recommendations
         
         # Performance recommendations
-        avg_time = sum(m.execution_time_ms for m in workflow_result.agent_metrics) / len(workflow_result.agent_metrics)
+        # A resumed workflow may not have run every agent
+        agent_metrics = workflow_result.agent_metrics or []
+        avg_time = sum(m.execution_time_ms for m in agent_metrics) / len(agent_metrics) if agent_metrics else 0.0
         if avg_time > 5000:  # 5 seconds
             recommendations.append("Consider optimizing agent performance - execution time is high")
         
@@ -157,146 +173,244 @@ class OverseerAgent:
         
         return recommendations
     
-    def execute_workflow(self, query: PriceQuery, checkout_request: Optional[CheckoutRequest] = None) -> WorkflowResult:
+    def execute_workflow(
+        self,
+        query: PriceQuery,
+        checkout_request: Optional[CheckoutRequest] = None,
+        trace: bool = False,
+    ) -> WorkflowResult:
         """
         Execute the complete grocery workflow: Scout -> Cart -> Checkout
         
+        Each stage's output is checkpointed under WorkflowResult.workflow_id,
+        so a failed workflow can be resumed with retry_failed_workflow.
+        
         Args:
             query: Price query with grocery items
             checkout_request: Optional checkout request (if None, stops at cart building)
+            trace: Record nested timing spans and return them in WorkflowResult.spans
+                (see app.tracing.chrome_trace for a flamegraph export)
         
         Returns:
             WorkflowResult with complete workflow information
         """
-        workflow_start = datetime.utcnow()
-        agent_metrics = []
-        errors = []
+        checkpoint = new_checkpoint(
+            query.model_dump(mode="json"),
+            checkout_request.model_dump(mode="json") if checkout_request else None,
+        )
+        return self._run_traced(checkpoint, trace)
+
+    def _run_traced(self, checkpoint: Checkpoint, trace: bool) -> WorkflowResult:
+        if not trace:
+            return self._run_workflow(checkpoint)
+        with start_trace() as active:
+            with span(
+                "workflow",
+                workflow_id=checkpoint["workflow_id"],
+                attempt=checkpoint["attempts"],
+                resumed_from=checkpoint["failed_stage"],
+            ):
+                workflow_result = self._run_workflow(checkpoint)
+        workflow_result.spans = active.spans
+        return workflow_result
+
+    async def stream_batch(
+        self,
+        queries: List[PriceQuery],
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[int, WorkflowResult]]:
+        """
+        Run one workflow per query and yield (query index, result) as each
+        completes. Items shared between queries are priced once (see
+        _prefill_scout); the workflows then run on worker threads, at most
+        max_concurrency (WORKFLOW_BATCH_MAX_CONCURRENCY) at a time.
+        """
+        checkpoints = [new_checkpoint(query.model_dump(mode="json"), None) for query in queries]
+        await asyncio.to_thread(self._prefill_scout, queries, checkpoints)
+        
+        semaphore = asyncio.Semaphore(max_concurrency or settings.workflow_batch_max_concurrency)
         
+        async def run(index: int, checkpoint: Checkpoint) -> Tuple[int, WorkflowResult]:
+            async with semaphore:
+                return index, await asyncio.to_thread(self._run_workflow, checkpoint)
+        
+        tasks = [asyncio.create_task(run(index, checkpoint)) for index, checkpoint in enumerate(checkpoints)]
         try:
-            # Step 1: Deal Scout Agent - Price Aggregation
-            scout_agent = DealScoutAgent(self._build_default_providers())
-            price_results, scout_metrics = self._execute_with_monitoring(
-                "DealScoutAgent", 
-                scout_agent.aggregate_prices, 
-                query
-            )
-            agent_metrics.append(scout_metrics)
-            
-            
-            # Step 2: Cart Builder Agent - Cart Optimization
-            
-            cart_agent = CartBuilderAgent()
-            cart_plan, cart_metrics = self._execute_with_monitoring(
-                "CartBuilderAgent",
-                cart_agent.build_cart,
-                price_results.items
-            )
-            agent_metrics.append(cart_metrics)
-            
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            # Client went away: drop the workflows that have not started yet
+            for task in tasks:
+                task.cancel()
+
+    def _prefill_scout(self, queries: List[PriceQuery], checkpoints: List[Checkpoint]) -> None:
+        """
+        Price every distinct item of the batch once (per location) and give
+        each workflow its scout checkpoint from that single pass. If the
+        shared pass fails, the workflows are left to run their own scout.
+        """
+        by_location: Dict[Optional[str], List[int]] = {}
+        for index, query in enumerate(queries):
+            by_location.setdefault(query.location_pin, []).append(index)
+        
+        for location_pin, indexes in by_location.items():
+            unique_items = {}
+            for index in indexes:
+                for item in queries[index].items:
+                    unique_items.setdefault(_item_key(item), item)
             
-            # Step 3: Order Executor Agent - Checkout (if requested)
-            final_order = None
-            if checkout_request:
-                executor_agent = OrderExecutorAgent()
-                checkout_request.items = cart_plan.options[cart_plan.best_option_index].items
-                checkout_request.provider = cart_plan.options[cart_plan.best_option_index].provider
-                
-                # Check delegation requirements before checkout
-                order_value = sum(item.unit_price for item in checkout_request.items)
-                required_role = check_grocery_delegation(order_value, "shopper")  # Default role
-                
-                if required_role and required_role != "shopper":
-                    pass
-                    # In production, this would create an approval flow
-                
-                final_order, executor_metrics = self._execute_with_monitoring(
-                    "OrderExecutorAgent",
-                    executor_agent.checkout,
-                    checkout_request,
-                    "shopper"  # Pass user role for delegation check
+            scout_agent = DealScoutAgent(self._build_default_providers())
+            try:
+                shared, _ = self._execute_with_monitoring(
+                    "DealScoutAgent",
+                    scout_agent.analyze,
+                    PriceQuery(items=list(unique_items.values()), location_pin=location_pin),
                 )
-                agent_metrics.append(executor_metrics)
-            
-            # Calculate workflow metrics
-            total_time = (datetime.utcnow() - workflow_start).total_seconds() * 1000
-            best_cart_option = cart_plan.options[cart_plan.best_option_index]
-            cost_savings = self._calculate_cost_savings(price_results.items, best_cart_option)
+            except Exception:
+                continue
             
-            # Generate recommendations
-            workflow_result = WorkflowResult(
-                success=True,
-                final_order=final_order,
-                cart_plan=cart_plan,
-                price_results=price_results,
-                agent_metrics=agent_metrics,
-                total_execution_time_ms=total_time,
-                total_cost_savings=cost_savings,
-                recommendations=self._generate_workflow_recommendations(WorkflowResult(
-                    success=True, cart_plan=cart_plan, total_cost_savings=cost_savings
-                )),
-                errors=errors
+            for index in indexes:
+                query = queries[index]
+                names = {item.name for item in query.items}
+                analysis = PriceAnalysis(
+                    query,
+                    {_item_key(item): shared.item_prices.get(_item_key(item), []) for item in query.items},
+                    {
+                        provider: [name for name in late if name in names]
+                        for provider, late in shared.late_results.items()
+                        if names.intersection(late)
+                    },
+                )
+                checkpoints[index]["stages"]["scout"] = dump_scout(analysis, analysis.result)
+
+    def _save_checkpoint(self, checkpoint: Checkpoint, **changes: Any) -> None:
+        checkpoint.update(changes, updated_at=datetime.utcnow().isoformat())
+        get_checkpoint_store().save(checkpoint)
+
+    def _run_workflow(self, checkpoint: Checkpoint, record: bool = True) -> WorkflowResult:
+        """
+        Run the workflow graph (app.langgraph_flow) for a checkpoint. Stages
+        with a checkpoint are restored, the rest run in order and are saved
+        as soon as they succeed; a stage that raises marks the workflow
+        failed at that stage and the stages before it are kept.
+        """
+        # langgraph_flow imports the agents package, so import it when first used
+        from ..langgraph_flow import StageFailed, get_workflow_graph
+
+        workflow_start = time.perf_counter_ns()
+        agent_metrics = []
+        errors = []
+        state = {
+            "query": PriceQuery.model_validate(checkpoint["query"]),
+            "checkout_request": (
+                CheckoutRequest.model_validate(checkpoint["checkout_request"])
+                if checkpoint["checkout_request"] else None
+            ),
+            "insights": {},
+            "errors": [],
+        }
+        # Replaying a succeeded workflow only rebuilds its result, so leave its status alone
+        replay = checkpoint["status"] == "succeeded"
+        if not replay:
+            self._save_checkpoint(checkpoint, status="running")
+        
+        try:
+            final_state = get_workflow_graph().invoke(
+                state,
+                config={"configurable": {"overseer": self, "checkpoint": checkpoint, "agent_metrics": agent_metrics}},
             )
-            
-            # Record this workflow run for tracking
-            self._update_workflow_history(workflow_result)
-            self._update_agent_performance(agent_metrics)
-            
-            return workflow_result
-            
         except Exception as e:
-            total_time = (datetime.utcnow() - workflow_start).total_seconds() * 1000
+            total_time = (time.perf_counter_ns() - workflow_start) / 1e6
+            stage = e.stage if isinstance(e, StageFailed) else checkpoint["failed_stage"] or STAGES[0]
             errors.append(f"Workflow failed: {str(e)}")
+            if not replay:
+                self._save_checkpoint(
+                    checkpoint,
+                    status="failed",
+                    failed_stage=stage,
+                    errors=checkpoint["errors"] + [f"{stage}: {e}"],
+                )
             
             workflow_result = WorkflowResult(
                 success=False,
                 agent_metrics=agent_metrics,
                 total_execution_time_ms=total_time,
-                errors=errors
+                errors=errors,
+                workflow_id=checkpoint["workflow_id"],
             )
             
-            self._update_workflow_history(workflow_result)
+            if record:
+                self._update_workflow_history(workflow_result)
             return workflow_result
+        
+        if not replay:
+            self._save_checkpoint(checkpoint, status="succeeded", failed_stage=None)
+        
+        # Calculate workflow metrics
+        total_time = (time.perf_counter_ns() - workflow_start) / 1e6
+        workflow_result = self._build_result(checkpoint, final_state, agent_metrics, total_time)
+        
+        # Record this workflow run for tracking
+        if record:
+            self._update_workflow_history(workflow_result)
+        
+        return workflow_result
+
+    def _build_result(
+        self,
+        checkpoint: Checkpoint,
+        final_state: Dict[str, Any],
+        agent_metrics: List[AgentMetrics],
+        total_time: float,
+    ) -> WorkflowResult:
+        cart_plan = final_state["cart_plan"]
+        best_cart_option = cart_plan.options[cart_plan.best_option_index]
+        cost_savings = self._calculate_cost_savings(final_state["analysis"].prices, best_cart_option)
+        
+        # Generate recommendations
+        return WorkflowResult(
+            success=True,
+            final_order=final_state.get("final_order"),
+            cart_plan=cart_plan,
+            price_results=final_state["price_results"],
+            agent_metrics=agent_metrics,
+            total_execution_time_ms=total_time,
+            total_cost_savings=cost_savings,
+            recommendations=self._generate_workflow_recommendations(WorkflowResult(
+                success=True, cart_plan=cart_plan, agent_metrics=agent_metrics,
+                total_cost_savings=cost_savings
+            )),
+            errors=final_state["errors"],
+            workflow_id=checkpoint["workflow_id"],
+            insights=final_state["insights"],
+        )
     
     def _update_workflow_history(self, workflow_result: WorkflowResult):
         """Update workflow history and statistics"""
-        self.workflow_history.append({
+        self.metrics.record_workflow({
             "timestamp": datetime.utcnow().isoformat(),
             "success": workflow_result.success,
             "execution_time_ms": workflow_result.total_execution_time_ms,
             "cost_savings": workflow_result.total_cost_savings,
             "errors": workflow_result.errors
         })
-        
-        self.workflow_stats["total_workflows"] += 1
-        if workflow_result.success:
-            self.workflow_stats["successful_workflows"] += 1
-            self.workflow_stats["total_cost_savings"] += workflow_result.total_cost_savings
-        else:
-            self.workflow_stats["failed_workflows"] += 1
-        
-        # Calculate average execution time across all workflows
-        total_time = sum(w["execution_time_ms"] for w in self.workflow_history)
-        self.workflow_stats["avg_execution_time"] = total_time / len(self.workflow_history)
-    
-    def _update_agent_performance(self, agent_metrics: List[AgentMetrics]):
-        """Update agent performance history"""
-        for metrics in agent_metrics:
-            self.agent_performance_history[metrics.agent_name].append(metrics)
     
     def get_workflow_analytics(self) -> Dict[str, Any]:
         """Get comprehensive workflow analytics"""
         return {
             "workflow_stats": self.workflow_stats,
+            "workflow_latency_ms": self.metrics.workflow_latency_ms.quantiles(),
             "agent_performance": {
                 agent: {
-                    "total_executions": len(metrics),
-                    "success_rate": sum(1 for m in metrics if m.success) / len(metrics) if metrics else 0,
-                    "avg_execution_time": sum(m.execution_time_ms for m in metrics) / len(metrics) if metrics else 0,
-                    "recent_errors": [m.error_message for m in metrics[-5:] if not m.success and m.error_message]
+                    "total_executions": stats["total_executions"],
+                    "success_rate": stats["success_rate"],
+                    "avg_execution_time": stats["avg_execution_time"],
+                    "latency_ms": stats["latency_ms"],
+                    "recent_errors": [m.error_message for m in stats["recent"] if not m.success and m.error_message]
                 }
-                for agent, metrics in self.agent_performance_history.items()
+                for agent, stats in self.metrics.agent_snapshot().items()
             },
-            "recent_workflows": self.workflow_history[-10:],  # Last 10 workflows
+            "recent_workflows": self.metrics.recent_workflows(10),
             "total_cost_savings": self.workflow_stats["total_cost_savings"]
         }
     
@@ -304,12 +418,12 @@ class OverseerAgent:
         """Get health status of all agents"""
         health_status = {}
         
-        for agent_name, metrics in self.agent_performance_history.items():
-            if not metrics:
+        for agent_name, stats in self.metrics.agent_snapshot().items():
+            recent_metrics = stats["recent"]  # Last 5 executions
+            if not recent_metrics:
                 health_status[agent_name] = "Unknown"
                 continue
             
-            recent_metrics = metrics[-5:]  # Last 5 executions
             success_rate = sum(1 for m in recent_metrics if m.success) / len(recent_metrics)
             avg_time = sum(m.execution_time_ms for m in recent_metrics) / len(recent_metrics)
             
@@ -324,8 +438,30 @@ class OverseerAgent:
         
         return health_status
     
-    def retry_failed_workflow(self, workflow_id: str) -> Optional[WorkflowResult]:
-        """Retry a failed workflow (placeholder for future implementation)"""
-        # This would implement retry logic for failed workflows
-        # For now, return None as placeholder
-        return None
+    def get_workflow(self, workflow_id: str) -> Optional[Checkpoint]:
+        """The checkpoint of a workflow: status, failed stage, errors and each completed stage's output"""
+        return get_checkpoint_store().load(workflow_id)
+    
+    def retry_failed_workflow(self, workflow_id: str, trace: bool = False) -> Optional[WorkflowResult]:
+        """
+        Resume a workflow from its first stage without a checkpoint. Stages
+        that already succeeded are never run again; a workflow that already
+        succeeded is returned from its checkpoints without running anything.
+        Returns None for an unknown (or expired) workflow id, and raises
+        WorkflowBusy while it is running: a failed workflow is claimed
+        atomically first, so concurrent retries cannot both resume it (and
+        place its order twice).
+        """
+        store = get_checkpoint_store()
+        checkpoint = store.load(workflow_id)
+        if checkpoint is None:
+            return None
+        
+        if checkpoint["status"] == "succeeded":
+            # Every stage is checkpointed, so this only rebuilds the result
+            return self._run_workflow(checkpoint, record=False)
+        
+        claimed = store.claim_for_retry(workflow_id)
+        if claimed is None:
+            raise WorkflowBusy(workflow_id)
+        return self._run_traced(claimed, trace)
@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..schemas.groceries import ProviderPrice
+from ..tracing import span, traced
+
+# Subsets of providers are enumerated exhaustively, so keep 2^n bounded
+MAX_EXACT_PROVIDERS = 16
+# Subgradient iterations for the Lagrangian bound on minimum orders
+LAGRANGE_ITERATIONS = 60
+# Branch-and-bound node budget per provider subset (tens of milliseconds at
+# most); only reached when many minimum-order constraints bind at once, and
+# reported via MixedCart.exact
+NODE_LIMIT = 2_000
+
+
+@dataclass
+class MixedCart:
+    providers: Tuple[str, ...]
+    items: List[ProviderPrice]
+    subtotal: float
+    delivery_fee: float
+    total: float
+    eta_minutes: int
+    exact: bool = True
+
+
+@dataclass
+class _Problem:
+    item_names: List[str]
+    provider_names: List[str]
+    costs: np.ndarray  # (items, providers), inf where not offered
+    offers: List[List[Optional[ProviderPrice]]]  # [item][provider]
+    fees: np.ndarray  # (providers,)
+    min_orders: np.ndarray  # (providers,)
+    etas: np.ndarray  # (providers,)
+    # False when providers past MAX_EXACT_PROVIDERS were left out
+    complete: bool = True
+    targets: np.ndarray = field(init=False)  # (providers,)
+    fee_sums: np.ndarray = field(init=False)  # (subsets,)
+
+    def __post_init__(self):
+        # A provider in a cart is used, so it takes at least its cheapest offer
+        offered_min = np.where(np.isfinite(self.costs), self.costs, np.inf).min(axis=0)
+        self.targets = np.maximum(self.min_orders, offered_min)
+        n = len(self.provider_names)
+        self.fee_sums = np.zeros(1 << n)
+        for subset in range(1, 1 << n):
+            low = subset & -subset
+            self.fee_sums[subset] = self.fee_sums[subset ^ low] + self.fees[low.bit_length() - 1]
+
+
+def _build_problem(prices: List[ProviderPrice]) -> Optional[_Problem]:
+    item_index: Dict[str, int] = {}
+    provider_index: Dict[str, int] = {}
+    best: Dict[Tuple[int, int], ProviderPrice] = {}
+    fees: Dict[str, float] = {}
+    min_orders: Dict[str, float] = {}
+    etas: Dict[str, int] = {}
+
+    # Prefer in-stock offers; an item nobody stocks falls back to all offers
+    stocked = {p.item_name for p in prices if p.in_stock}
+    for price in prices:
+        if not price.in_stock and price.item_name in stocked:
+            continue
+        i = item_index.setdefault(price.item_name, len(item_index))
+        j = provider_index.setdefault(price.provider, len(provider_index))
+        current = best.get((i, j))
+        if current is None or price.unit_price < current.unit_price:
+            best[(i, j)] = price
+        # Provider-level terms, as in the single-provider carts
+        fees[price.provider] = max(fees.get(price.provider, 0.0), price.delivery_fee or 0.0)
+        min_orders[price.provider] = float(price.metadata.get("min_order", 0) or 0)
+        etas[price.provider] = max(etas.get(price.provider, 0), price.delivery_eta_minutes or 0)
+
+    if not best:
+        return None
+
+    providers = list(provider_index)
+    complete = len(providers) <= MAX_EXACT_PROVIDERS
+    if not complete:
+        # Keep the providers covering the most items, cheapest first
+        coverage = {j: [0, 0.0] for j in range(len(providers))}
+        for (_, j), price in best.items():
+            coverage[j][0] += 1
+            coverage[j][1] += price.unit_price
+        keep = sorted(coverage, key=lambda j: (-coverage[j][0], coverage[j][1]))[:MAX_EXACT_PROVIDERS]
+        remap = {old: new for new, old in enumerate(sorted(keep))}
+        providers = [providers[old] for old in sorted(keep)]
+        best = {(i, remap[j]): p for (i, j), p in best.items() if j in remap}
+        covered = sorted({i for i, _ in best})
+        item_remap = {old: new for new, old in enumerate(covered)}
+        item_index = {name: item_remap[i] for name, i in item_index.items() if i in item_remap}
+        best = {(item_remap[i], j): p for (i, j), p in best.items()}
+
+    n_items, n_providers = len(item_index), len(providers)
+    costs = np.full((n_items, n_providers), np.inf)
+    offers: List[List[Optional[ProviderPrice]]] = [[None] * n_providers for _ in range(n_items)]
+    for (i, j), price in best.items():
+        costs[i, j] = price.unit_price
+        offers[i][j] = price
+
+    return _Problem(
+        item_names=list(item_index),
+        provider_names=providers,
+        costs=costs,
+        offers=offers,
+        fees=np.array([fees[p] for p in providers]),
+        min_orders=np.array([min_orders[p] for p in providers]),
+        etas=np.array([etas[p] for p in providers]),
+        complete=complete,
+    )
+
+
+def _repair(costs: np.ndarray, offered: np.ndarray, targets: np.ndarray, assign: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Greedy feasible assignment starting from `assign`: move the cheapest
+    items (per rupee of deficit covered) onto providers short of their
+    target, then move items back to cheaper providers wherever the source
+    provider stays above its target. Returns None if it gets stuck.
+    """
+    n_items, k = costs.shape
+    rows = np.arange(n_items)
+    assign = assign.copy()
+    for _ in range(n_items):
+        current = costs[rows, assign]
+        subtotals = np.bincount(assign, weights=current, minlength=k)
+        short = np.flatnonzero(subtotals < targets - 1e-9)
+        if not short.size:
+            break
+        j = short[0]
+        surplus = subtotals - targets
+        movable = offered[:, j] & (assign != j) & (surplus[assign] >= current - 1e-9)
+        if not movable.any():
+            return None
+        covered = np.minimum(np.where(offered[:, j], costs[:, j], 0.0), targets[j] - subtotals[j])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            score = np.where(movable, (costs[:, j] - current) / covered, np.inf)
+        assign[int(score.argmin())] = j
+    else:
+        return None
+
+    improved = True
+    while improved:
+        improved = False
+        current = costs[rows, assign]
+        subtotals = np.bincount(assign, weights=current, minlength=k)
+        for i in np.argsort(costs.min(axis=1) - current):
+            src = assign[i]
+            dst = int(costs[i].argmin())
+            if dst != src and subtotals[src] - costs[i, src] >= targets[src] - 1e-9:
+                subtotals[src] -= costs[i, src]
+                subtotals[dst] += costs[i, dst]
+                assign[i] = dst
+                improved = True
+    return assign
+
+
+@traced("cart.solve.subset", lambda problem, columns, incumbent: {"providers": len(columns)})
+def _solve_subset(
+    problem: _Problem, columns: List[int], incumbent: float
+) -> Tuple[float, Optional[List[int]], bool]:
+    """
+    Cheapest assignment of every item to a provider in `columns` such that
+    each of those providers is used and reaches its minimum order. Returns
+    (item cost, provider per item, exact); the assignment is None when
+    nothing beats `incumbent`.
+
+    Being used at all is the same as reaching the provider's cheapest
+    offer, so both conditions become one target per provider. Infeasible
+    greedy assignments go to branch and bound on a Lagrangian relaxation of
+    the targets: subgradient steps give the multipliers and a lower bound,
+    items whose reduced cost exceeds the gap to the best known cart are
+    fixed, and only the remaining near-ties are branched on. A cart costs
+    the bound plus its reduced costs plus each multiplier times the
+    provider's overshoot of its target, so a node also pays for the
+    overshoot its choices (and the fixed items) already force.
+    """
+    costs = problem.costs[:, columns]
+    n_items, k = costs.shape
+    rows = np.arange(n_items)
+    offered = np.isfinite(costs)
+    targets = problem.targets[columns]
+
+    # Fast path: cheapest-per-item already satisfies every provider
+    greedy = costs.argmin(axis=1)
+    greedy_cost = float(costs[rows, greedy].sum())
+    subtotals = np.bincount(greedy, weights=costs[rows, greedy], minlength=k)
+    if np.all(subtotals >= targets - 1e-9):
+        if greedy_cost < incumbent:
+            return greedy_cost, [columns[j] for j in greedy], True
+        return incumbent, None, True
+    if np.any(np.where(offered, costs, 0.0).sum(axis=0) < targets - 1e-9):
+        return incumbent, None, True
+
+    best_cost = incumbent
+    best_assign: Optional[np.ndarray] = None
+    repaired = _repair(costs, offered, targets, greedy)
+    if repaired is not None and costs[rows, repaired].sum() < best_cost:
+        best_cost = float(costs[rows, repaired].sum())
+        best_assign = repaired
+
+    # Subgradient ascent on L(lam) = sum_i min_j c_ij (1 - lam_j) + lam . targets
+    lam = np.zeros(k)
+    bound, best_lam = -math.inf, lam
+    step_scale, stalled = 2.0, 0
+    for _ in range(LAGRANGE_ITERATIONS):
+        scaled = np.where(offered, costs * (1.0 - lam), np.inf)
+        assign = scaled.argmin(axis=1)
+        value = float(scaled[rows, assign].sum() + lam @ targets)
+        if value > bound + 1e-9:
+            bound, best_lam, stalled = value, lam.copy(), 0
+        else:
+            stalled += 1
+            if stalled >= 5:
+                step_scale, stalled = step_scale / 2, 0
+        if bound >= best_cost - 1e-9:
+            break
+        gradient = targets - np.bincount(assign, weights=costs[rows, assign], minlength=k)
+        if np.all(gradient <= 1e-9):
+            cost = float(costs[rows, assign].sum())
+            if cost < best_cost:
+                best_cost, best_assign = cost, assign
+            continue
+        norm = float(gradient @ gradient)
+        goal = best_cost if math.isfinite(best_cost) else value + abs(value) * 0.05 + 1.0
+        lam = np.maximum(0.0, lam + step_scale * (goal - value) / norm * gradient)
+
+    if bound >= best_cost - 1e-9:
+        if best_assign is None:
+            return incumbent, None, True
+        return best_cost, [columns[j] for j in best_assign], True
+
+    # Branch and bound with the multipliers fixed: the bound at a node is
+    # the root bound plus the reduced costs of the choices made so far
+    scaled = np.where(offered, costs * (1.0 - best_lam), np.inf)
+    reduced = scaled - scaled.min(axis=1)[:, None]
+    choices = [
+        [j for j in np.argsort(reduced[i]) if reduced[i, j] < best_cost - bound - 1e-9]
+        for i in range(n_items)
+    ]
+    if any(not options for options in choices):
+        return (incumbent, None, True) if best_assign is None else (best_cost, [columns[j] for j in best_assign], True)
+
+    # Items with one option are fixed; branch on the rest, fewest options first
+    order = sorted(
+        range(n_items),
+        key=lambda i: (len(choices[i]) == 1, len(choices[i]), reduced[i, choices[i][1]] if len(choices[i]) > 1 else 0.0),
+    )
+    n_branch = sum(len(options) > 1 for options in choices)
+    cost_rows = [costs[i].tolist() for i in order]
+    reduced_rows = [reduced[i].tolist() for i in order]
+    choice_rows = [[int(j) for j in choices[i]] for i in order]
+    suffix_max = [[0.0] * k for _ in range(n_branch + 1)]
+    for pos in range(n_branch - 1, -1, -1):
+        suffix_max[pos] = list(suffix_max[pos + 1])
+        for j in choice_rows[pos]:
+            suffix_max[pos][j] += cost_rows[pos][j]
+
+    target_list = targets.tolist()
+    lam_list = best_lam.tolist()
+    subtotal = [0.0] * k
+    fixed_cost = 0.0
+    for pos in range(n_branch, n_items):
+        j = choice_rows[pos][0]
+        subtotal[j] += cost_rows[pos][j]
+        fixed_cost += cost_rows[pos][j]
+    overshoot = sum(lam * max(0.0, sub - target) for lam, sub, target in zip(lam_list, subtotal, target_list))
+    assignment = [0] * n_branch
+    nodes = 0
+
+    def search(pos: int, cost: float, slack: float) -> None:
+        nonlocal best_cost, best_assign, nodes
+        nodes += 1
+        if nodes > NODE_LIMIT or bound + slack >= best_cost - 1e-9:
+            return
+        for j in range(k):
+            if subtotal[j] + suffix_max[pos][j] < target_list[j] - 1e-9:
+                return
+        if pos == n_branch:
+            if cost + fixed_cost < best_cost:
+                best_cost = cost + fixed_cost
+                best_assign = np.empty(n_items, dtype=np.int64)
+                for p, item in enumerate(order):
+                    best_assign[item] = assignment[p] if p < n_branch else choice_rows[p][0]
+            return
+        row, reduced_row = cost_rows[pos], reduced_rows[pos]
+        for j in choice_rows[pos]:
+            over = subtotal[j] - target_list[j]
+            assignment[pos] = j
+            subtotal[j] += row[j]
+            search(pos + 1, cost + row[j], slack + reduced_row[j] + lam_list[j] * (max(0.0, over + row[j]) - max(0.0, over)))
+            subtotal[j] -= row[j]
+
+    search(0, 0.0, overshoot)
+    exact = nodes <= NODE_LIMIT
+    if best_assign is None:
+        return incumbent, None, exact
+    return best_cost, [columns[j] for j in best_assign], exact
+
+
+def _subset_bounds(problem: _Problem) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lower bound on the total of a cart from each provider subset, and its ETA.
+
+    The bound is the larger of the per-item cheapest costs within the subset
+    and the sum of its providers' targets, plus their fees. Subsets are
+    walked depth first, each extending its parent by a higher provider, so
+    only one row of per-item minima per level is held rather than one per
+    subset.
+    """
+    n_items, n_providers = problem.costs.shape
+    lower_bounds = np.full(1 << n_providers, np.inf)
+    subset_eta = np.zeros(1 << n_providers, dtype=np.int64)
+
+    def visit(subset: int, start: int, minima: np.ndarray, target_sum: float) -> None:
+        for j in range(start, n_providers):
+            child = subset | 1 << j
+            child_minima = np.minimum(minima, problem.costs[:, j])
+            child_targets = target_sum + float(problem.targets[j])
+            lower_bounds[child] = max(float(child_minima.sum()), child_targets) + problem.fee_sums[child]
+            subset_eta[child] = max(subset_eta[subset], problem.etas[j])
+            visit(child, j + 1, child_minima, child_targets)
+
+    visit(0, 0, np.full(n_items, np.inf), 0.0)
+    return lower_bounds, subset_eta
+
+
+@traced("cart.solve")
+def solve_mixed_carts(prices: List[ProviderPrice]) -> List[MixedCart]:
+    """
+    Exact provider assignment for a mixed cart.
+
+    Minimizes item cost plus one delivery fee per provider used, subject to
+    each used provider's minimum order (metadata "min_order"). Every subset
+    of providers is a candidate: subsets are visited in (ETA, lower bound)
+    order and skipped once a faster-or-equal cart is already at least as
+    cheap, and subsets whose cheapest assignment misses a minimum order are
+    repaired by branch and bound. The cart ETA is the slowest provider's ETA.
+
+    Returns the Pareto set of total cost vs. ETA, fastest first. A cart is
+    exact when every subset up to it was solved to optimality; once one runs
+    out of its node budget, the carts from there on are the best found, and
+    so is the cheapest cart, as a cheaper and slower one may have been missed.
+    """
+    problem = _build_problem(prices)
+    if problem is None:
+        return []
+
+    n_items, n_providers = problem.costs.shape
+    n_subsets = 1 << n_providers
+    with span("cart.solve.bounds", subsets=n_subsets, items=n_items):
+        lower_bounds, subset_eta = _subset_bounds(problem)
+
+    candidates = [s for s in range(1, n_subsets) if math.isfinite(lower_bounds[s])]
+    candidates.sort(key=lambda s: (subset_eta[s], lower_bounds[s]))
+
+    front: List[MixedCart] = []
+    best_total = math.inf  # cheapest cart found with ETA <= current subset's
+    exact = problem.complete  # every subset so far solved to optimality
+    for subset in candidates:
+        if lower_bounds[subset] >= best_total - 1e-9:
+            continue
+        columns = [j for j in range(n_providers) if subset >> j & 1]
+        fee_total = float(problem.fee_sums[subset])
+        item_cost, assignment, subset_exact = _solve_subset(problem, columns, best_total - fee_total)
+        exact = exact and subset_exact
+        if assignment is None:
+            continue
+
+        best_total = item_cost + fee_total
+        items = [problem.offers[i][j] for i, j in enumerate(assignment)]
+        cart = MixedCart(
+            providers=tuple(problem.provider_names[j] for j in columns),
+            items=items,
+            subtotal=round(item_cost, 2),
+            delivery_fee=round(fee_total, 2),
+            total=round(best_total, 2),
+            eta_minutes=int(subset_eta[subset]),
+            exact=exact,
+        )
+        # Same ETA as the previous front entry but cheaper: replace it
+        if front and front[-1].eta_minutes == cart.eta_minutes:
+            front[-1] = cart
+        else:
+            front.append(cart)
+
+    if front and not exact:
+        # A cheaper, slower cart may have been missed after the last one
+        front[-1].exact = False
+    return front
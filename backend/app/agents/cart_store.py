@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Protocol, Sequence, Tuple
+
+import redis
+from redis.exceptions import WatchError
+
+from ..config import settings
+
+CartItem = Dict[str, Any]  # { id, provider, item_name, unit_price, delivery_fee, qty, metadata }
+
+# (line id, new line); a None line removes it
+LineUpdate = Tuple[str, Optional[CartItem]]
+
+# Shared id for requests without a signed-in user (see get_optional_user_id)
+ANONYMOUS_USER_ID = "anonymous"
+
+
+def merge_line(existing: Optional[CartItem], line: CartItem) -> CartItem:
+    """Incoming line wins, except that a missing delivery fee keeps the existing one"""
+    if existing and not line.get("delivery_fee"):
+        return {**line, "delivery_fee": existing.get("delivery_fee", 0.0)}
+    return line
+
+
+class Cart:
+    """
+    Cart lines keyed by line id, with running totals.
+
+    The subtotal and the delivery total (one fee per provider: the fee on
+    that provider's earliest line) are updated on every put/remove, so both
+    are O(1) per change and a summary never rescans the lines.
+    """
+
+    def __init__(self, lines: Iterable[CartItem] = ()):
+        self.lines: Dict[str, CartItem] = {}
+        self.subtotal = 0.0
+        self.delivery = 0.0
+        # provider -> {line id: delivery fee}, in insertion order
+        self._provider_fees: Dict[str, Dict[str, float]] = {}
+        for line in lines:
+            self.put(line)
+
+    def _provider_fee(self, provider: str) -> float:
+        fees = self._provider_fees.get(provider)
+        return next(iter(fees.values())) if fees else 0.0
+
+    def get(self, line_id: str) -> Optional[CartItem]:
+        return self.lines.get(line_id)
+
+    def put(self, line: CartItem) -> None:
+        """Insert or replace a line; a replaced line keeps its position"""
+        line_id, provider = line["id"], line["provider"]
+        existing = self.lines.get(line_id)
+        if existing:
+            self.subtotal -= existing["unit_price"] * existing.get("qty", 1)
+        before = self._provider_fee(provider)
+        self._provider_fees.setdefault(provider, {})[line_id] = line.get("delivery_fee", 0.0)
+        self.delivery += self._provider_fee(provider) - before
+        self.subtotal += line["unit_price"] * line.get("qty", 1)
+        self.lines[line_id] = line
+
+    def remove(self, line_id: str) -> None:
+        line = self.lines.pop(line_id, None)
+        if line is None:
+            return
+        provider = line["provider"]
+        before = self._provider_fee(provider)
+        fees = self._provider_fees[provider]
+        del fees[line_id]
+        if not fees:
+            del self._provider_fees[provider]
+        self.delivery += self._provider_fee(provider) - before
+        self.subtotal -= line["unit_price"] * line.get("qty", 1)
+        if not self.lines:
+            # Drop accumulated float error once the cart is empty
+            self.subtotal = self.delivery = 0.0
+
+    def apply(self, updates: Iterable[LineUpdate]) -> None:
+        for line_id, line in updates:
+            if line is None:
+                self.remove(line_id)
+            else:
+                self.put(merge_line(self.lines.get(line_id), line))
+
+    def copy(self) -> "Cart":
+        # Lines are replaced, never mutated, so a shallow copy is a snapshot
+        clone = Cart()
+        clone.lines = dict(self.lines)
+        clone.subtotal = self.subtotal
+        clone.delivery = self.delivery
+        clone._provider_fees = {provider: dict(fees) for provider, fees in self._provider_fees.items()}
+        return clone
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+
+class CartStore(Protocol):
+    def cart(self, user_id: str) -> Cart: ...
+    def apply(self, user_id: str, updates: Sequence[LineUpdate]) -> Cart: ...
+    def clear(self, user_id: str) -> None: ...
+
+
+class MemoryCartStore:
+    """Per-process carts; fine for a single worker and for development"""
+
+    def __init__(self):
+        self._carts: Dict[str, Cart] = {}
+        self._lock = threading.Lock()
+
+    def cart(self, user_id: str) -> Cart:
+        with self._lock:
+            cart = self._carts.get(user_id)
+            return cart.copy() if cart else Cart()
+
+    def apply(self, user_id: str, updates: Sequence[LineUpdate]) -> Cart:
+        with self._lock:
+            cart = self._carts.setdefault(user_id, Cart())
+            cart.apply(updates)
+            return cart.copy()
+
+    def clear(self, user_id: str) -> None:
+        with self._lock:
+            self._carts.pop(user_id, None)
+
+
+class RedisCartStore:
+    """
+    Carts shared by all workers: one Redis hash per user, field = line id,
+    value = the JSON line plus its insertion sequence ("_seq"), since hash
+    field order is not preserved and cart order decides which line's
+    delivery fee counts for a provider.
+
+    A batch of line updates is one optimistic transaction (WATCH the hash,
+    read the touched lines, then MULTI/EXEC the writes), so concurrent edits
+    to the same cart never interleave. The cart is read back inside the
+    same pipeline. Anonymous carts expire after anonymous_ttl_seconds
+    without a change.
+    """
+
+    def __init__(self, client: redis.Redis, anonymous_ttl_seconds: int, key_prefix: str = "cart"):
+        self.client = client
+        self.anonymous_ttl_seconds = anonymous_ttl_seconds
+        self.key_prefix = key_prefix
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.key_prefix}:{user_id}"
+
+    def _ttl(self, user_id: str) -> Optional[int]:
+        if user_id == ANONYMOUS_USER_ID and self.anonymous_ttl_seconds > 0:
+            return self.anonymous_ttl_seconds
+        return None
+
+    @staticmethod
+    def _decode(raw: Dict[bytes, bytes]) -> Cart:
+        stored = sorted((json.loads(value) for value in raw.values()), key=lambda line: line["_seq"])
+        for line in stored:
+            del line["_seq"]
+        return Cart(stored)
+
+    def cart(self, user_id: str) -> Cart:
+        return self._decode(self.client.hgetall(self._key(user_id)))
+
+    def apply(self, user_id: str, updates: Sequence[LineUpdate]) -> Cart:
+        key = self._key(user_id)
+        ttl = self._ttl(user_id)
+        touched = list(dict.fromkeys(line_id for line_id, _ in updates))
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    stored = pipe.hmget(key, touched) if touched else []
+                    current: Dict[str, Optional[CartItem]] = {
+                        line_id: json.loads(raw) if raw else None for line_id, raw in zip(touched, stored)
+                    }
+
+                    # Fold the batch in order so repeated ids behave as sequential calls
+                    seq = time.time_ns()
+                    for line_id, line in updates:
+                        if line is None:
+                            current[line_id] = None
+                            continue
+                        existing = current[line_id]
+                        seq += 1
+                        current[line_id] = {**merge_line(existing, line), "_seq": existing["_seq"] if existing else seq}
+
+                    pipe.multi()
+                    removed = [line_id for line_id, line in current.items() if line is None]
+                    written = {line_id: json.dumps(line) for line_id, line in current.items() if line is not None}
+                    if removed:
+                        pipe.hdel(key, *removed)
+                    if written:
+                        pipe.hset(key, mapping=written)
+                    if ttl:
+                        pipe.expire(key, ttl)
+                    pipe.hgetall(key)
+                    return self._decode(pipe.execute()[-1])
+                except WatchError:
+                    continue
+
+    def clear(self, user_id: str) -> None:
+        self.client.delete(self._key(user_id))
+
+
+_store: Optional[CartStore] = None
+_store_lock = threading.Lock()
+
+
+def get_cart_store() -> CartStore:
+    """Process-wide cart store selected by CART_STORE_BACKEND ("memory" or "redis")"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.cart_store_backend == "redis":
+                    _store = RedisCartStore(
+                        redis.Redis.from_url(settings.redis_url),
+                        anonymous_ttl_seconds=settings.cart_anonymous_ttl_seconds,
+                    )
+                else:
+                    _store = MemoryCartStore()
+    return _store
+
+
+def set_cart_store(store: CartStore) -> None:
+    """Swap the backend, e.g. in tests or at application startup"""
+    global _store
+    _store = store
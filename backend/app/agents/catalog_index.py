@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional
+
+
+class CatalogIndex:
+    """
+    Prebuilt name matcher for a price catalog.
+
+    Resolves a free-text item name to a catalog entry with the same rules the
+    providers have always used: an exact (case-insensitive) key match first,
+    then - for names of at least 3 letters - the first catalog entry, in
+    catalog order, where a word of the entry occurs in the name or the name
+    occurs in the entry.
+
+    Instead of scanning the catalog per lookup it keeps:
+    - an inverted word index (word -> earliest entry containing it), probed
+      with every substring of the name whose length matches a catalog word;
+    - a trigram index used to find entries that contain the whole name;
+    - an LRU of resolved names, including misses, shared by every provider.
+    """
+
+    MIN_PARTIAL_LENGTH = 3
+
+    def __init__(self, catalog: Mapping[str, Mapping[str, Any]], cache_size: int = 4096):
+        self.catalog = catalog
+        self.cache_size = cache_size
+        self._names: List[str] = list(catalog)
+        self._words: Dict[str, int] = {}
+        self._trigrams: Dict[str, List[int]] = {}
+
+        for position, name in enumerate(self._names):
+            for word in name.split():
+                self._words.setdefault(word, position)
+            for trigram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                self._trigrams.setdefault(trigram, []).append(position)
+
+        self._word_lengths = sorted({len(word) for word in self._words})
+        self._resolved: OrderedDict[str, Optional[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def match(self, item_name: str) -> Optional[str]:
+        """Return the catalog key an item name resolves to, or None"""
+        item_lower = item_name.lower()
+        if item_lower in self.catalog:
+            return item_lower
+
+        with self._lock:
+            if item_lower in self._resolved:
+                self._resolved.move_to_end(item_lower)
+                return self._resolved[item_lower]
+
+        key = self._match_partial(item_lower)
+
+        with self._lock:
+            self._resolved[item_lower] = key
+            if len(self._resolved) > self.cache_size:
+                self._resolved.popitem(last=False)
+        return key
+
+    def get(self, item_name: str) -> Optional[Mapping[str, Any]]:
+        """Return the catalog entry an item name resolves to, or None"""
+        key = self.match(item_name)
+        return self.catalog[key] if key is not None else None
+
+    def base_price(self, item_name: str) -> Optional[float]:
+        entry = self.get(item_name)
+        return entry["base_price"] if entry is not None else None
+
+    def _match_partial(self, item_lower: str) -> Optional[str]:
+        length = len(item_lower)
+        if length < self.MIN_PARTIAL_LENGTH:
+            return None
+
+        # Entries with a word occurring inside the name (this also covers the
+        # whole entry occurring inside the name)
+        best = len(self._names)
+        for word_length in self._word_lengths:
+            if word_length > length:
+                break
+            for start in range(length - word_length + 1):
+                position = self._words.get(item_lower[start:start + word_length])
+                if position is not None and position < best:
+                    best = position
+
+        # Entries containing the whole name: every trigram of the name must be
+        # present, so only the rarest trigram's postings need verifying
+        postings = [self._trigrams.get(item_lower[i:i + 3]) for i in range(length - 2)]
+        if all(postings):
+            for position in min(postings, key=len):
+                if position >= best:
+                    break
+                if item_lower in self._names[position]:
+                    best = position
+                    break
+
+        return self._names[best] if best < len(self._names) else None
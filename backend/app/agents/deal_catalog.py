@@ -0,0 +1,481 @@
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.entities import GroceryDeal, GroceryItem, GroceryPlatform
+from ..schemas.groceries import GroceryItem as QueryItem, ProviderPrice
+from ..tracing import span
+from .catalog_index import CatalogIndex
+from .normalize import normalize_item_name
+
+logger = logging.getLogger(__name__)
+
+# Cells with no deal
+_NO_DEAL = 0
+_NO_ETA = -1
+
+
+def platform_key(name: str) -> str:
+    """Provider name for a platform: "Amazon Fresh" -> "amazon_fresh" """
+    return normalize_item_name(name).replace(" ", "_")
+
+
+@dataclass(frozen=True)
+class PlatformInfo:
+    id: int
+    key: str
+    base_url: str
+    delivery_fee: float
+    minimum_order: float
+    delivery_time_min: Optional[int]
+    is_active: bool
+
+
+@dataclass(frozen=True)
+class ItemInfo:
+    id: int
+    name: str
+    category: str
+    brand: Optional[str]
+    unit: str
+
+
+def platform_info(platform: Any) -> PlatformInfo:
+    """PlatformInfo for a grocery_platforms row"""
+    return PlatformInfo(
+        id=platform.id,
+        key=platform_key(platform.name),
+        base_url=platform.base_url,
+        delivery_fee=float(platform.delivery_fee or 0.0),
+        minimum_order=float(platform.minimum_order or 0.0),
+        delivery_time_min=platform.delivery_time_min,
+        is_active=bool(platform.is_active),
+    )
+
+
+def deal_price(
+    item_name: str,
+    platform: PlatformInfo,
+    category: str,
+    deal_id: int,
+    unit_price: float,
+    original_price: Optional[float],
+    discount_percent: Optional[float],
+    in_stock: bool,
+    eta_minutes: Optional[int],
+    deal_type: Optional[str],
+    deal_details: Optional[Dict[str, Any]],
+) -> ProviderPrice:
+    """ProviderPrice for a grocery_deals row (missing ETAs fall back to the platform's)"""
+    metadata: Dict[str, Any] = {
+        "source": "database",
+        "deal_id": deal_id,
+        "original_price": unit_price if original_price is None else original_price,
+        "discount_percent": 0.0 if discount_percent is None else discount_percent,
+        "category": category,
+        "min_order": platform.minimum_order,
+        "platform_strategy": platform.key,
+    }
+    if deal_type:
+        metadata["deal_type"] = deal_type
+    if deal_details:
+        metadata["deal_details"] = deal_details
+
+    return ProviderPrice(
+        provider=platform.key,
+        item_name=item_name,
+        unit_price=unit_price,
+        currency="INR",
+        in_stock=in_stock,
+        delivery_fee=platform.delivery_fee,
+        delivery_eta_minutes=eta_minutes if eta_minutes is not None else platform.delivery_time_min,
+        url=f"{platform.base_url.rstrip('/')}/product/{item_name.replace(' ', '-')}",
+        metadata=metadata,
+    )
+
+
+class CatalogSnapshot:
+    """
+    Immutable columnar view of grocery_deals.
+
+    Item and platform ids are interned to dense row and column numbers, and
+    each deal field is an (items, platforms) array, so a lookup is a name
+    match plus a handful of array reads. Only the latest deal (by
+    last_updated, then id) of each item/platform pair is kept.
+
+    Snapshots are never modified: with_changes() returns a new one, so
+    readers take a reference and need no locking.
+    """
+
+    def __init__(self):
+        self.items: List[ItemInfo] = []
+        self.platforms: List[PlatformInfo] = []
+        self.item_rows: Dict[int, int] = {}
+        self.platform_columns: Dict[int, int] = {}
+        self.columns_by_key: Dict[str, int] = {}
+        # Rows per (normalized name, normalized brand), the key ingest uses,
+        # and every row of a name (unbranded first), matched with CatalogIndex
+        self.rows_by_item: Dict[Tuple[str, str], int] = {}
+        self.rows_by_name: Dict[str, List[int]] = {}
+        self.index = CatalogIndex({})
+        # Newest last_updated loaded, and the deals loaded with exactly that
+        # stamp (refresh reads from the watermark inclusive, to catch rows
+        # committed later with the same stamp)
+        self.watermark: Optional[datetime] = None
+        self.watermark_ids: frozenset = frozenset()
+
+        shape = (0, 0)
+        self.deal_id = np.zeros(shape, dtype=np.int64)
+        self.updated = np.zeros(shape, dtype=np.float64)  # last_updated as a timestamp
+        self.price = np.full(shape, np.nan, dtype=np.float64)
+        self.original_price = np.full(shape, np.nan, dtype=np.float64)
+        self.discount = np.full(shape, np.nan, dtype=np.float64)
+        self.in_stock = np.zeros(shape, dtype=bool)
+        self.eta = np.full(shape, _NO_ETA, dtype=np.int32)
+        # Sparse: most deals have neither
+        self.deal_extras: Dict[Tuple[int, int], Tuple[Optional[str], Optional[Dict[str, Any]]]] = {}
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.deal_id))
+
+    def lookup(self, item_name: str, platform: str, brand: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """
+        (row, column) of an item on a platform, or None. The item of the
+        given brand is preferred; without one (or without a deal for it on
+        the platform) the first item of that name with a deal is used.
+        """
+        column = self.columns_by_key.get(platform)
+        if column is None:
+            return None
+        name = self.index.match(normalize_item_name(item_name))
+        if name is None:
+            return None
+        if brand:
+            row = self.rows_by_item.get((name, normalize_item_name(brand)))
+            if row is not None and self.deal_id[row, column] != _NO_DEAL:
+                return row, column
+        for row in self.rows_by_name[name]:
+            if self.deal_id[row, column] != _NO_DEAL:
+                return row, column
+        return None
+
+    def price_for(self, query: QueryItem, platform: str) -> Optional[ProviderPrice]:
+        cell = self.lookup(query.name, platform, query.preferred_brand)
+        if cell is None:
+            return None
+        row, column = cell
+        info = self.platforms[column]
+        if not info.is_active:
+            return None
+
+        original_price = float(self.original_price[row, column])
+        discount = float(self.discount[row, column])
+        eta = int(self.eta[row, column])
+        deal_type, deal_details = self.deal_extras.get(cell, (None, None))
+        return deal_price(
+            query.name,
+            info,
+            self.items[row].category,
+            deal_id=int(self.deal_id[row, column]),
+            unit_price=float(self.price[row, column]),
+            original_price=None if np.isnan(original_price) else original_price,
+            discount_percent=None if np.isnan(discount) else discount,
+            in_stock=bool(self.in_stock[row, column]),
+            eta_minutes=None if eta == _NO_ETA else eta,
+            deal_type=deal_type,
+            deal_details=deal_details,
+        )
+
+    def with_changes(self, platforms: Sequence[Any], deals: Sequence[Any]) -> CatalogSnapshot:
+        """
+        New snapshot with every platform row replaced and the deal rows
+        (joined with their items, oldest first) applied on top.
+        """
+        new = CatalogSnapshot()
+        new.items = list(self.items)
+        new.item_rows = dict(self.item_rows)
+        new.rows_by_item = self.rows_by_item
+        new.rows_by_name = self.rows_by_name
+        new.platforms = list(self.platforms)
+        new.platform_columns = dict(self.platform_columns)
+        new.deal_extras = dict(self.deal_extras)
+        new.watermark = self.watermark
+        new.watermark_ids = self.watermark_ids
+
+        for platform in platforms:
+            info = platform_info(platform)
+            column = new.platform_columns.get(platform.id)
+            if column is None:
+                new.platform_columns[platform.id] = len(new.platforms)
+                new.platforms.append(info)
+            else:
+                new.platforms[column] = info
+
+        names_changed = False
+        for deal in deals:
+            info = ItemInfo(deal.item_id, deal.name, deal.category, deal.brand, deal.unit)
+            row = new.item_rows.get(deal.item_id)
+            if row is None:
+                new.item_rows[deal.item_id] = len(new.items)
+                new.items.append(info)
+                names_changed = True
+            else:
+                current = new.items[row]
+                names_changed = names_changed or (current.name, current.brand) != (info.name, info.brand)
+                new.items[row] = info
+
+        if names_changed:
+            new.rows_by_item = {}
+            unbranded: Dict[str, List[int]] = {}
+            branded: Dict[str, List[int]] = {}
+            for row, item in enumerate(new.items):
+                name, brand = normalize_item_name(item.name), normalize_item_name(item.brand or "")
+                new.rows_by_item.setdefault((name, brand), row)
+                (branded if brand else unbranded).setdefault(name, []).append(row)
+                branded.setdefault(name, [])
+            new.rows_by_name = {name: unbranded.get(name, []) + rows for name, rows in branded.items()}
+            new.index = CatalogIndex({name: {} for name in new.rows_by_name})
+        else:
+            new.index = self.index
+
+        new.columns_by_key = {}
+        for column, info in enumerate(new.platforms):
+            new.columns_by_key.setdefault(info.key, column)
+
+        new._copy_cells(self, len(new.items), len(new.platforms))
+        new._apply_deals(deals)
+        return new
+
+    def _copy_cells(self, old: CatalogSnapshot, rows: int, columns: int) -> None:
+        old_rows, old_columns = old.deal_id.shape
+        for name, fill in (
+            ("deal_id", _NO_DEAL),
+            ("updated", 0.0),
+            ("price", np.nan),
+            ("original_price", np.nan),
+            ("discount", np.nan),
+            ("in_stock", False),
+            ("eta", _NO_ETA),
+        ):
+            source = getattr(old, name)
+            target = np.full((rows, columns), fill, dtype=source.dtype)
+            target[:old_rows, :old_columns] = source
+            setattr(self, name, target)
+
+    def _apply_deals(self, deals: Sequence[Any]) -> None:
+        # Latest deal per cell wins; ties on last_updated go to the higher id
+        latest: Dict[Tuple[int, int], Any] = {}
+        for deal in deals:
+            if deal.platform_id not in self.platform_columns:
+                continue
+            cell = (self.item_rows[deal.item_id], self.platform_columns[deal.platform_id])
+            stamp = deal.last_updated.timestamp() if deal.last_updated else 0.0
+            current_id = int(self.deal_id[cell])
+            if current_id not in (_NO_DEAL, deal.id):
+                if (float(self.updated[cell]), current_id) > (stamp, deal.id):
+                    continue
+            previous = latest.get(cell)
+            if previous is not None and (previous[0], previous[1].id) > (stamp, deal.id):
+                continue
+            latest[cell] = (stamp, deal)
+
+        stamps = [deal.last_updated for deal in deals if deal.last_updated is not None]
+        if stamps and (self.watermark is None or max(stamps) >= self.watermark):
+            newest = max(stamps)
+            carried = self.watermark_ids if newest == self.watermark else frozenset()
+            self.watermark = newest
+            self.watermark_ids = carried | {deal.id for deal in deals if deal.last_updated == newest}
+
+        if not latest:
+            return
+        rows, columns = (np.array(axis, dtype=np.intp) for axis in zip(*latest))
+        entries = list(latest.values())
+        deals_only = [deal for _, deal in entries]
+
+        def floats(values: Iterable[Optional[float]]) -> np.ndarray:
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+        self.deal_id[rows, columns] = [deal.id for deal in deals_only]
+        self.updated[rows, columns] = [stamp for stamp, _ in entries]
+        self.price[rows, columns] = floats(deal.current_price for deal in deals_only)
+        self.original_price[rows, columns] = floats(deal.original_price for deal in deals_only)
+        self.discount[rows, columns] = floats(deal.discount_percentage for deal in deals_only)
+        self.in_stock[rows, columns] = [
+            True if deal.stock_available is None else bool(deal.stock_available) for deal in deals_only
+        ]
+        self.eta[rows, columns] = [
+            _NO_ETA if deal.delivery_time is None else deal.delivery_time for deal in deals_only
+        ]
+        for cell, deal in zip(latest, deals_only):
+            if deal.deal_type or deal.deal_details:
+                self.deal_extras[cell] = (deal.deal_type, deal.deal_details)
+            else:
+                self.deal_extras.pop(cell, None)
+
+
+_DEAL_COLUMNS = (
+    GroceryDeal.id,
+    GroceryDeal.item_id,
+    GroceryDeal.platform_id,
+    GroceryDeal.current_price,
+    GroceryDeal.original_price,
+    GroceryDeal.discount_percentage,
+    GroceryDeal.stock_available,
+    GroceryDeal.delivery_time,
+    GroceryDeal.deal_type,
+    GroceryDeal.deal_details,
+    GroceryDeal.last_updated,
+    GroceryItem.name,
+    GroceryItem.category,
+    GroceryItem.brand,
+    GroceryItem.unit,
+)
+
+
+class DealCatalog:
+    """
+    Prices from grocery_deals, served from an in-memory CatalogSnapshot.
+
+    load() reads every deal once. refresh() re-reads the (small) platform
+    table but only the deals whose last_updated is at or after the newest
+    one already loaded, and swaps in a new snapshot when anything changed.
+    Deleting a deal row is not visible to refresh(); mark it out of stock
+    (or call load()) instead.
+
+    start() refreshes every refresh_seconds on a daemon thread.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], refresh_seconds: float):
+        self.session_factory = session_factory
+        self.refresh_seconds = refresh_seconds
+        self.stats: Dict[str, int] = {"loads": 0, "refreshes": 0, "deals_applied": 0}
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.load()
+            snapshot = self._snapshot
+        return snapshot
+
+    def _read(self, since: Optional[datetime]) -> Tuple[List[Any], List[Any]]:
+        deals = select(*_DEAL_COLUMNS).join(GroceryItem, GroceryItem.id == GroceryDeal.item_id)
+        if since is not None:
+            deals = deals.where(GroceryDeal.last_updated >= since)
+        deals = deals.order_by(GroceryDeal.last_updated, GroceryDeal.id)
+
+        db = self.session_factory()
+        try:
+            platforms = db.execute(select(GroceryPlatform).order_by(GroceryPlatform.id)).scalars().all()
+            return list(platforms), db.execute(deals).all()
+        finally:
+            db.close()
+
+    def load(self) -> int:
+        """Replace the snapshot with every deal; returns how many were read"""
+        with self._refresh_lock:
+            with span("catalog.load"):
+                platforms, deals = self._read(None)
+                self._snapshot = CatalogSnapshot().with_changes(platforms, deals)
+            self.stats["loads"] += 1
+            self.stats["deals_applied"] += len(deals)
+            return len(deals)
+
+    def refresh(self) -> int:
+        """Apply deals changed since the last load or refresh; returns how many were read"""
+        if self._snapshot is None:
+            return self.load()
+        with self._refresh_lock:
+            current = self._snapshot
+            with span("catalog.refresh"):
+                platforms, deals = self._read(current.watermark)
+                # Rows at the watermark itself were read last time, unless new
+                deals = [
+                    deal for deal in deals
+                    if deal.last_updated != current.watermark or deal.id not in current.watermark_ids
+                ]
+                if deals or self._platforms_changed(current, platforms):
+                    self._snapshot = current.with_changes(platforms, deals)
+            self.stats["refreshes"] += 1
+            self.stats["deals_applied"] += len(deals)
+            return len(deals)
+
+    @staticmethod
+    def _platforms_changed(snapshot: CatalogSnapshot, platforms: Sequence[Any]) -> bool:
+        if len(platforms) != len(snapshot.platforms):
+            return True
+        for platform in platforms:
+            column = snapshot.platform_columns.get(platform.id)
+            if column is None:
+                return True
+            if snapshot.platforms[column] != platform_info(platform):
+                return True
+        return False
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as exc:
+                # Keep serving the last snapshot
+                logger.warning("catalog: refresh failed: %s", exc)
+
+    def start(self) -> None:
+        """Load the snapshot and keep it refreshed in the background"""
+        if self._thread is not None:
+            return
+        self.load()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="deal-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def providers(self) -> List[CatalogProvider]:
+        """One provider per active platform"""
+        return [
+            CatalogProvider(info.key, self)
+            for info in self.snapshot.platforms
+            if info.is_active
+        ]
+
+
+@dataclass
+class CatalogProvider:
+    """ProviderAdapter serving one platform's prices from a DealCatalog"""
+    platform: str
+    catalog: DealCatalog
+
+    def name(self) -> str:
+        return self.platform
+
+    def search(self, query: QueryItem, location_pin: str | None) -> ProviderPrice | None:
+        return self.catalog.snapshot.price_for(query, self.platform)
+
+
+deal_catalog = DealCatalog(SessionLocal, refresh_seconds=settings.price_catalog_refresh_seconds)
+
+
+def use_deal_catalog() -> bool:
+    """Whether providers should come from grocery_deals (PRICE_CATALOG_BACKEND=database)"""
+    return settings.price_catalog_backend == "database"
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .catalog_index import CatalogIndex
+from .normalize import UNIT_ALIASES, normalize_item_name, normalize_unit
+
+# Platform mentions, longest first so "swiggy instamart" wins over "instamart"
+PLATFORM_ALIASES: List[Tuple[str, str]] = sorted(
+    [
+        ("amazon fresh", "amazon_fresh"),
+        ("amazon_fresh", "amazon_fresh"),
+        ("uber eats", "uber_eats"),
+        ("uber_eats", "uber_eats"),
+        ("swiggy instamart", "instamart"),
+        ("instamart", "instamart"),
+        ("instacart", "instacart"),
+        ("blinkit", "blinkit"),
+        ("bigbasket", "bigbasket"),
+        ("big basket", "bigbasket"),
+    ],
+    key=lambda alias: -len(alias[0]),
+)
+
+_UNITS = "|".join(sorted((re.escape(unit) for unit in UNIT_ALIASES), key=len, reverse=True))
+_QUANTITY = r"(?P<qty>\d+(?:\.\d+)?|(?:an?|one|two|three|four|five|six|seven|eight|nine|ten)(?=\s))"
+_NAME = r"(?P<name>[a-z][a-z '\-]*[a-z])"
+
+# "2 kg of rice", "2kg rice", "a dozen eggs", "3 bananas"
+_QTY_FIRST = re.compile(rf"^{_QUANTITY}\s*(?:(?P<unit>{_UNITS})\.?\s+)?(?:of\s+)?{_NAME}$")
+# "rice 2kg", "milk - 2 liters"
+_NAME_FIRST = re.compile(rf"^{_NAME}\s*[-:x]?\s*(?P<qty>\d+(?:\.\d+)?)\s*(?P<unit>{_UNITS})?\.?$")
+# "rice", "some onions"
+_NAME_ONLY = re.compile(rf"^(?:some\s+)?{_NAME}$")
+
+_SEPARATORS = re.compile(r"\s*(?:,|;|\n|&|\+|\band\b|\bplus\b)\s*")
+_FILLER = re.compile(r"^(?:please\s+|i\s+(?:want|need)\s+|get\s+(?:me\s+)?|buy\s+|order\s+|add\s+)+")
+_WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+# Words that leave a name unread when left in it: quantities, negations, a trailing "x"
+_LEFTOVER_WORDS = frozenset(_WORD_NUMBERS) | frozenset(UNIT_ALIASES) | {
+    "half", "quarter", "x", "no", "not", "without", "dont", "don't", "skip", "except", "please",
+}
+
+# Per-segment confidence levels
+_CONFIDENT = 1.0  # quantity and/or unit present and the name is a catalog key
+_BARE_KNOWN = 0.85  # just a catalog key, quantity defaults to 1
+_UNKNOWN_ITEM = 0.4  # grammatical, but the name is not exactly a catalog key
+_UNPARSED = 0.0
+
+
+def _extract_platform(text: str) -> Tuple[str, Optional[str]]:
+    """Strip a "from <platform>" style mention and return it separately"""
+    for alias, platform in PLATFORM_ALIASES:
+        pattern = re.compile(rf"\s*\b(?:from|on|at|via|using|in)?\s*\b{re.escape(alias)}\b")
+        if pattern.search(text):
+            return pattern.sub(" ", text).strip(), platform
+    return text, None
+
+
+def _quantity(raw: str) -> int:
+    if raw in _WORD_NUMBERS:
+        return _WORD_NUMBERS[raw]
+    return max(1, round(float(raw)))
+
+
+def _catalog_name(name: str, catalog: CatalogIndex) -> str:
+    """Prefer the catalog spelling of plurals: "tomatoes" -> "tomato" """
+    if name in catalog.catalog:
+        return name
+    for suffix in ("es", "s"):
+        if name.endswith(suffix) and name[:-len(suffix)] in catalog.catalog:
+            return name[:-len(suffix)]
+    return name
+
+
+def _parse_segment(segment: str, catalog: CatalogIndex) -> Tuple[Optional[Dict[str, Any]], float]:
+    segment = _FILLER.sub("", normalize_item_name(segment)).strip(" .!")
+    if not segment:
+        return None, _CONFIDENT  # empty fragment, e.g. a trailing separator
+
+    match = _QTY_FIRST.match(segment) or _NAME_FIRST.match(segment)
+    explicit = match is not None
+    if match is None:
+        match = _NAME_ONLY.match(segment)
+        if match is None:
+            return None, _UNPARSED
+
+    name = _catalog_name(normalize_item_name(match.group("name")), catalog)
+    if len(name) < 2 or _LEFTOVER_WORDS.intersection(name.split()):
+        return None, _UNPARSED
+
+    groups = match.groupdict()
+    item = {
+        "name": name,
+        "quantity": _quantity(groups["qty"]) if groups.get("qty") else 1,
+        "unit": normalize_unit(groups.get("unit")),
+    }
+
+    # Partial catalog matches may hide unread words, so only exact keys are trusted
+    if name not in catalog.catalog:
+        return item, _UNKNOWN_ITEM
+    return item, _CONFIDENT if explicit else _BARE_KNOWN
+
+
+def parse_grocery_text(text: str, catalog: CatalogIndex) -> Tuple[Dict[str, Any], float]:
+    """
+    Deterministic parser for the common "<qty> <unit> of <item>" shapes.
+
+    Returns the same {"platform", "items"} shape as GroceryTextParser plus a
+    confidence in [0, 1]: the lowest confidence of any segment, so a single
+    fragment it cannot read (or an item missing from the catalog) is enough
+    to send the text to the LLM.
+    """
+    text, platform = _extract_platform(text.strip().lower())
+
+    items: List[Dict[str, Any]] = []
+    confidence = _CONFIDENT
+    for segment in _SEPARATORS.split(text):
+        item, segment_confidence = _parse_segment(segment, catalog)
+        confidence = min(confidence, segment_confidence)
+        if item is not None:
+            items.append(item)
+
+    if not items:
+        confidence = _UNPARSED
+    return {"platform": platform, "items": items}, confidence
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+# Normalized unit forms, matching what GroceryTextParser is asked to emit
+UNIT_ALIASES = {
+    "kg": "kg", "kgs": "kg", "kilo": "kg", "kilos": "kg", "kilogram": "kg", "kilograms": "kg",
+    "g": "g", "gm": "g", "gms": "g", "gram": "g", "grams": "g",
+    "l": "liter", "ltr": "liter", "ltrs": "liter", "liter": "liter", "liters": "liter",
+    "litre": "liter", "litres": "liter",
+    "ml": "ml", "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "piece": "piece", "pieces": "piece", "pc": "piece", "pcs": "piece",
+    "dozen": "dozen", "dozens": "dozen",
+    "packet": "packet", "packets": "packet",
+    "pack": "pack", "packs": "pack",
+    "bunch": "bunch", "bunches": "bunch",
+    "loaf": "loaf", "loaves": "loaf",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_item_name(name: str) -> str:
+    """Lowercase and collapse whitespace: "  Basmati  Rice " -> "basmati rice" """
+    return _WHITESPACE.sub(" ", name).strip().lower()
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    """Map unit spellings onto the normalized forms; missing units are pieces"""
+    if not unit:
+        return "piece"
+    unit = normalize_item_name(unit).rstrip(".")
+    return UNIT_ALIASES.get(unit, unit)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List
+
+from ..cache import TieredCache
+from ..config import settings
+from ..singleflight import SingleFlight
+from ..schemas.groceries import GroceryItem, PriceQuery, ProviderPrice
+from .normalize import normalize_item_name, normalize_unit
+
+# Cached pricing for a query:
+# {"prices": {item ident: [ProviderPrice, ...]}, "late_results": {provider: [item, ...]}}
+CachedPricing = Dict[str, Any]
+
+
+def item_ident(item: GroceryItem) -> str:
+    """Identity of an item for pricing purposes (quantity and unit do not change unit prices)"""
+    brand = normalize_item_name(item.preferred_brand) if item.preferred_brand else ""
+    return f"{normalize_item_name(item.name)}|{brand}"
+
+
+def price_query_key(query: PriceQuery, provider_names: Iterable[str]) -> str:
+    """Canonical hash of a PriceQuery: item order, case, spacing and unit spelling do not matter"""
+    items = sorted(
+        (
+            normalize_item_name(item.name),
+            item.quantity or 1,
+            normalize_unit(item.unit),
+            normalize_item_name(item.preferred_brand) if item.preferred_brand else "",
+        )
+        for item in query.items
+    )
+    canonical = json.dumps(
+        {
+            "items": items,
+            "location_pin": (query.location_pin or "").strip(),
+            "providers": sorted(provider_names),
+        },
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def encode_pricing(pricing: CachedPricing) -> Dict[str, Any]:
+    return {
+        "prices": {
+            ident: [price.model_dump() for price in prices]
+            for ident, prices in pricing["prices"].items()
+        },
+        "late_results": pricing["late_results"],
+    }
+
+
+def decode_pricing(raw: Dict[str, Any]) -> CachedPricing:
+    return {
+        "prices": {
+            ident: [ProviderPrice.model_validate(price) for price in prices]
+            for ident, prices in raw["prices"].items()
+        },
+        "late_results": raw["late_results"],
+    }
+
+
+def prices_for_item(pricing: CachedPricing, item: GroceryItem) -> List[ProviderPrice]:
+    """Cached prices for an item, relabelled with the caller's spelling of the name"""
+    return [
+        price if price.item_name == item.name else price.model_copy(update={"item_name": item.name})
+        for price in pricing["prices"].get(item_ident(item), [])
+    ]
+
+
+price_cache: TieredCache[CachedPricing] = TieredCache(
+    "prices",
+    ttl_seconds=settings.price_cache_ttl_seconds,
+    stale_seconds=settings.price_cache_stale_seconds,
+    maxsize=settings.price_cache_max_entries,
+    redis_url=settings.redis_url,
+    encode=encode_pricing,
+    decode=decode_pricing,
+    # Bursts of identical queries cost one aggregation
+    single_flight=SingleFlight(
+        "prices",
+        redis_url=settings.redis_url,
+        lock_seconds=settings.single_flight_lock_seconds,
+        poll_seconds=settings.single_flight_poll_seconds,
+        encode=encode_pricing,
+        decode=decode_pricing,
+    ),
+)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+import redis
+
+from ..cache import CacheEntry, LRUCache
+from ..config import settings
+from ..schemas.groceries import PriceQuery, PriceResult, ProviderPrice
+from .agent_a_deal_scout import PriceAnalysis
+
+# Workflow stages in execution order; a checkpoint holds the output of each
+# stage that has completed
+STAGES = ("scout", "cart", "checkout")
+
+# {
+#   "workflow_id", "status": "running" | "failed" | "succeeded",
+#   "created_at", "updated_at", "attempts",
+#   "query": PriceQuery, "checkout_request": CheckoutRequest | None,
+#   "stages": {"scout": {"item_prices", "price_results"}, "cart": CartPlan, "checkout": CheckoutResponse},
+#   "failed_stage": str | None, "errors": [str, ...]
+# }  (pydantic models stored as their JSON dumps)
+Checkpoint = Dict[str, Any]
+
+
+def new_checkpoint(query: Dict[str, Any], checkout_request: Optional[Dict[str, Any]]) -> Checkpoint:
+    now = datetime.utcnow().isoformat()
+    return {
+        "workflow_id": uuid.uuid4().hex,
+        "status": "running",
+        "created_at": now,
+        "updated_at": now,
+        "attempts": 1,
+        "query": query,
+        "checkout_request": checkout_request,
+        "stages": {},
+        "failed_stage": None,
+        "errors": [],
+    }
+
+
+def dump_scout(analysis: PriceAnalysis, price_results: PriceResult) -> Dict[str, Any]:
+    return {
+        "item_prices": {
+            key: [p.model_dump(mode="json") for p in prices] for key, prices in analysis.item_prices.items()
+        },
+        "price_results": price_results.model_dump(mode="json"),
+    }
+
+
+def load_scout(stage: Dict[str, Any], query: PriceQuery) -> Tuple[PriceAnalysis, PriceResult]:
+    price_results = PriceResult.model_validate(stage["price_results"])
+    item_prices = {
+        key: [ProviderPrice.model_validate(p) for p in prices] for key, prices in stage["item_prices"].items()
+    }
+    return PriceAnalysis(query, item_prices, price_results.late_results), price_results
+
+
+class WorkflowBusy(Exception):
+    """The workflow is running, or another retry claimed it first"""
+
+    def __init__(self, workflow_id: str):
+        super().__init__(f"Workflow {workflow_id} is already running")
+        self.workflow_id = workflow_id
+
+
+def _mark_retrying(checkpoint: Checkpoint) -> None:
+    checkpoint.update(
+        status="running",
+        attempts=checkpoint["attempts"] + 1,
+        updated_at=datetime.utcnow().isoformat(),
+    )
+
+
+class CheckpointStore(Protocol):
+    def load(self, workflow_id: str) -> Optional[Checkpoint]: ...
+    def save(self, checkpoint: Checkpoint) -> None: ...
+    def claim_for_retry(self, workflow_id: str) -> Optional[Checkpoint]:
+        """
+        Atomically move a failed workflow to running (one more attempt) and
+        return it; None if it is unknown or not failed, so only one of any
+        concurrent retries resumes it.
+        """
+        ...
+
+
+class MemoryCheckpointStore:
+    """Per-process checkpoints, bounded and expiring like the other local caches"""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self._entries: LRUCache[str] = LRUCache(maxsize, ttl_seconds)
+        self._lock = threading.Lock()
+
+    def load(self, workflow_id: str) -> Optional[Checkpoint]:
+        entry = self._entries.get(workflow_id)
+        # Stored serialized so callers can never mutate a saved checkpoint
+        return json.loads(entry.value) if entry else None
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        with self._lock:
+            self._entries.set(checkpoint["workflow_id"], CacheEntry(json.dumps(checkpoint), time.time()))
+
+    def claim_for_retry(self, workflow_id: str) -> Optional[Checkpoint]:
+        with self._lock:
+            checkpoint = self.load(workflow_id)
+            if checkpoint is None or checkpoint["status"] != "failed":
+                return None
+            _mark_retrying(checkpoint)
+            self._entries.set(workflow_id, CacheEntry(json.dumps(checkpoint), time.time()))
+            return checkpoint
+
+
+class RedisCheckpointStore:
+    """Checkpoints shared by all workers: one JSON string per workflow with a TTL"""
+
+    def __init__(self, client: redis.Redis, ttl_seconds: int, key_prefix: str = "workflow"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+
+    def _key(self, workflow_id: str) -> str:
+        return f"{self.key_prefix}:{workflow_id}"
+
+    def load(self, workflow_id: str) -> Optional[Checkpoint]:
+        raw = self.client.get(self._key(workflow_id))
+        return json.loads(raw) if raw else None
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        self.client.set(self._key(checkpoint["workflow_id"]), json.dumps(checkpoint), ex=self.ttl_seconds)
+
+    def claim_for_retry(self, workflow_id: str) -> Optional[Checkpoint]:
+        key = self._key(workflow_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    # Compare-and-set: the write fails if the key changed after WATCH
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    checkpoint = json.loads(raw) if raw else None
+                    if checkpoint is None or checkpoint["status"] != "failed":
+                        pipe.unwatch()
+                        return None
+                    _mark_retrying(checkpoint)
+                    pipe.multi()
+                    pipe.set(key, json.dumps(checkpoint), ex=self.ttl_seconds)
+                    pipe.execute()
+                    return checkpoint
+                except redis.WatchError:
+                    continue  # changed meanwhile: read it again
+
+
+_store: Optional[CheckpointStore] = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Process-wide checkpoint store selected by WORKFLOW_CHECKPOINT_BACKEND ("memory" or "redis")"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.workflow_checkpoint_backend == "redis":
+                    _store = RedisCheckpointStore(
+                        redis.Redis.from_url(settings.redis_url),
+                        ttl_seconds=settings.workflow_checkpoint_ttl_seconds,
+                    )
+                else:
+                    _store = MemoryCheckpointStore(
+                        settings.workflow_checkpoint_max_entries,
+                        settings.workflow_checkpoint_ttl_seconds,
+                    )
+    return _store
+
+
+def set_checkpoint_store(store: CheckpointStore) -> None:
+    """Swap the backend, e.g. in tests or at application startup"""
+    global _store
+    _store = store
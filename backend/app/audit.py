@@ -1,11 +1,141 @@
+import logging
+import threading
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal
 from .models.entities import AuditLog
 
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    Buffered audit sink: events are queued in memory and written by a
+    background thread in bulk inserts, every flush_interval_seconds or as
+    soon as batch_size events are waiting, so audited requests never wait
+    on a commit.
+
+    Overflow policy: audit events are never dropped for being too many. When
+    max_queue events are waiting, the caller that queues the next one
+    flushes synchronously (backpressure). Events are only dropped if the
+    database keeps failing and re-queuing them would exceed max_queue.
+
+    Until start() is called (scripts, Celery workers) every event is written
+    through immediately. stop() flushes whatever is left.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_queue: int,
+        batch_size: int,
+        flush_interval_seconds: float,
+    ):
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.stats: Dict[str, int] = {"queued": 0, "written": 0, "batches": 0, "overflow_flushes": 0, "dropped": 0}
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one bulk insert at a time
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._queue.append(entry)
+            self.stats["queued"] += 1
+            waiting = len(self._queue)
+
+        if self._thread is None:
+            self.flush()
+        elif waiting >= self.max_queue:
+            self.stats["overflow_flushes"] += 1
+            self.flush()
+        elif waiting >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write every queued event; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                batch: List[Dict[str, Any]] = list(self._queue)
+                self._queue.clear()
+            if not batch:
+                return 0
+
+            db = self.session_factory()
+            try:
+                for start in range(0, len(batch), self.batch_size):
+                    db.execute(insert(AuditLog), batch[start:start + self.batch_size])
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                self._requeue(batch, exc)
+                return 0
+            finally:
+                db.close()
+
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            return len(batch)
+
+    def _requeue(self, batch: List[Dict[str, Any]], exc: Exception) -> None:
+        with self._lock:
+            room = max(0, self.max_queue - len(self._queue))
+            kept = batch[len(batch) - room:] if room < len(batch) else batch
+            # Oldest first, ahead of anything queued meanwhile
+            self._queue.extendleft(reversed(kept))
+            dropped = len(batch) - len(kept)
+            self.stats["dropped"] += dropped
+        logger.error("audit: writing %d events failed, %d dropped: %s", len(batch), dropped, exc)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Stop the background thread and flush what is left"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+audit_writer = AuditWriter(
+    SessionLocal,
+    max_queue=settings.audit_queue_max,
+    batch_size=settings.audit_batch_size,
+    flush_interval_seconds=settings.audit_flush_interval_seconds,
+)
+
 
 def log_event(
-    db: Session,
+    db: Optional[Session],
     document_id: Optional[str],
     agent: str,
     action: str,
@@ -13,14 +143,15 @@ def log_event(
     token_subject: Optional[str] = None,
     user_session: Optional[str] = None,
 ) -> None:
-    entry = AuditLog(
-        timestamp=datetime.utcnow(),
-        document_id=document_id,
-        agent=agent,
-        action=action,
-        result=result,
-        token_subject=token_subject or "system",
-        user_session=user_session or "n/a",
+    """Queue an audit event on audit_writer (db is no longer used; events are written in batches)"""
+    audit_writer.submit(
+        {
+            "timestamp": datetime.utcnow(),
+            "document_id": document_id,
+            "agent": agent,
+            "action": action,
+            "result": result,
+            "token_subject": token_subject or "system",
+            "user_session": user_session or "n/a",
+        }
     )
-    db.add(entry)
-    db.commit()
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Generic, Optional, Set, TypeVar
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+if TYPE_CHECKING:
+    from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# How long to stop talking to Redis after a connection failure
+REDIS_RETRY_AFTER_SECONDS = 30.0
+
+
+@dataclass
+class CacheEntry(Generic[T]):
+    value: T
+    stored_at: float  # wall-clock seconds, comparable across workers
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class LRUCache(Generic[T]):
+    """Thread-safe in-process LRU; entries older than max_age_seconds are dropped on read"""
+
+    def __init__(self, maxsize: int, max_age_seconds: float):
+        self.maxsize = maxsize
+        self.max_age_seconds = max_age_seconds
+        self._entries: OrderedDict[str, CacheEntry[T]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry[T]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.age() > self.max_age_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry[T]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache(Generic[T]):
+    """
+    TTL cache with an in-process LRU tier in front of a shared Redis tier.
+
+    Entries are fresh for ttl_seconds. For a further stale_seconds they are
+    still served, while get_or_compute refreshes them in the background
+    (stale-while-revalidate), so hot keys never wait on recomputation.
+
+    The local tier keeps values as-is; the Redis tier stores them through
+    encode/decode (JSON by default). Redis failures degrade to local-only
+    caching for REDIS_RETRY_AFTER_SECONDS instead of failing the caller.
+
+    With a single_flight, concurrent misses on the same key (in this
+    process or, through Redis, in others) share one computation.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: float,
+        stale_seconds: float = 0.0,
+        maxsize: int = 1024,
+        redis_url: Optional[str] = None,
+        encode: Callable[[T], Any] = lambda value: value,
+        decode: Callable[[Any], T] = lambda raw: raw,
+        single_flight: Optional[SingleFlight[T]] = None,
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.redis_url = redis_url
+        self.encode = encode
+        self.decode = decode
+        self.single_flight = single_flight
+        self.local: LRUCache[T] = LRUCache(maxsize, ttl_seconds + stale_seconds)
+        self.stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+        self._redis: Optional[aioredis.Redis] = None
+        self._redis_down_until = 0.0
+        self._refreshing: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _client(self) -> Optional[aioredis.Redis]:
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.Redis.from_url(
+                self.redis_url, socket_timeout=0.25, socket_connect_timeout=0.25
+            )
+        return self._redis
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning("cache %s: redis unavailable, using local tier only: %s", self.namespace, exc)
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+
+    async def get(self, key: str) -> Optional[CacheEntry[T]]:
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(self._redis_key(key))
+        except (RedisError, OSError) as exc:
+            self._redis_failed(exc)
+            return None
+        if raw is None:
+            return None
+
+        payload = json.loads(raw)
+        entry = CacheEntry(self.decode(payload["value"]), payload["stored_at"])
+        self.local.set(key, entry)
+        return entry
+
+    async def set(self, key: str, value: T) -> None:
+        entry = CacheEntry(value, time.time())
+        self.local.set(key, entry)
+
+        client = self._client()
+        if client is None:
+            return
+        payload = json.dumps({"stored_at": entry.stored_at, "value": self.encode(value)})
+        try:
+            await client.set(
+                self._redis_key(key),
+                payload,
+                ex=max(1, int(self.ttl_seconds + self.stale_seconds)),
+            )
+        except (RedisError, OSError) as exc:
+            self._redis_failed(exc)
+
+    async def delete(self, key: str) -> None:
+        self.local.delete(key)
+        client = self._client()
+        if client is None:
+            return
+        try:
+            await client.delete(self._redis_key(key))
+        except (RedisError, OSError) as exc:
+            self._redis_failed(exc)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[T]],
+        should_cache: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """Return the cached value for key, computing it on a miss"""
+        entry = await self.get(key)
+        if entry is not None:
+            age = entry.age()
+            if age <= self.ttl_seconds:
+                self.stats["hits"] += 1
+                return entry.value
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self.stats["stale_hits"] += 1
+                self._schedule_refresh(key, compute, should_cache)
+                return entry.value
+
+        self.stats["misses"] += 1
+
+        async def compute_and_store() -> T:
+            value = await compute()
+            if should_cache is None or should_cache(value):
+                await self.set(key, value)
+            return value
+
+        if self.single_flight is None:
+            return await compute_and_store()
+        return await self.single_flight.run(key, compute_and_store)
+
+    def _schedule_refresh(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[T]],
+        should_cache: Optional[Callable[[T], bool]],
+    ) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh() -> None:
+            try:
+                value = await compute()
+                if should_cache is None or should_cache(value):
+                    await self.set(key, value)
+                    self.stats["refreshes"] += 1
+            except Exception as exc:
+                # Keep serving the stale value; the next request retries
+                logger.warning("cache %s: background refresh failed: %s", self.namespace, exc)
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
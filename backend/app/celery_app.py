@@ -1,5 +1,6 @@
 from celery import Celery
 from .config import settings
+from .serialization import MSGPACK_SERIALIZER, register_msgpack_serializer
 
 celery_app = Celery(
     "contract_workflow",
@@ -7,10 +8,30 @@ celery_app = Celery(
     backend=settings.redis_url,
 )
 
+register_msgpack_serializer()
+
+
+def _compression() -> str | None:
+    """CELERY_COMPRESSION, with zstd falling back to zlib when zstandard is not installed"""
+    name = settings.celery_compression.lower()
+    if name in ("", "none"):
+        return None
+    if name == "zstd":
+        try:
+            import zstandard  # noqa: F401  (kombu registers zstd only when it is importable)
+        except ImportError:
+            return "zlib"
+    return name
+
+
 celery_app.conf.update(
-    task_serializer="json",
-    result_serializer="json",
-    accept_content=["json"],
+    task_serializer=settings.celery_serializer,
+    result_serializer=settings.celery_serializer,
+    # JSON stays accepted so messages queued by older producers still decode
+    accept_content=[MSGPACK_SERIALIZER, "json"],
+    result_accept_content=[MSGPACK_SERIALIZER, "json"],
+    task_compression=_compression(),
+    result_compression=_compression(),
     timezone="UTC",
     enable_utc=True,
 )
@@ -8,8 +8,21 @@ class Settings(BaseSettings):
     secret_key: str = Field(default="change-me", alias="SECRET_KEY")
     access_token_expire_minutes: int = Field(default=60, alias="ACCESS_TOKEN_EXPIRE_MINUTES")
     database_url: str = Field(default="sqlite:///./grocery_scout.db", alias="DATABASE_URL")
+    # Connection pool (shared by the API and the Celery workers, per process)
+    db_pool_size: int = Field(default=10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, alias="DB_MAX_OVERFLOW")
+    db_pool_recycle_seconds: int = Field(default=1800, alias="DB_POOL_RECYCLE_SECONDS")
+    db_pool_timeout_seconds: float = Field(default=30.0, alias="DB_POOL_TIMEOUT_SECONDS")
+
+    # Buffered audit log writer (see audit.AuditWriter)
+    audit_queue_max: int = Field(default=10000, alias="AUDIT_QUEUE_MAX")
+    audit_batch_size: int = Field(default=500, alias="AUDIT_BATCH_SIZE")
+    audit_flush_interval_seconds: float = Field(default=1.0, alias="AUDIT_FLUSH_INTERVAL_SECONDS")
     redis_url: str = Field(default="redis://localhost:6379/0", alias="REDIS_URL")
     broker_url: str = Field(default="redis://localhost:6379/1", alias="BROKER_URL")
+    # Celery payloads: "ormsgpack" or "json"; compression "zstd", "zlib" or "none"
+    celery_serializer: str = Field(default="ormsgpack", alias="CELERY_SERIALIZER")
+    celery_compression: str = Field(default="zstd", alias="CELERY_COMPRESSION")
     default_admin_email: str = Field(default="admin@example.com", alias="DEFAULT_ADMIN_EMAIL")
     default_admin_password: str = Field(default="admin123", alias="DEFAULT_ADMIN_PASSWORD")
     token_issuer: str = Field(default="grocery-scout-backend", alias="TOKEN_ISSUER")
@@ -23,6 +36,46 @@ class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: str = Field(default="", alias="OPENAI_API_KEY")
 
+    # Provider fan-out (async price aggregation)
+    provider_timeout_seconds: float = Field(default=2.0, alias="PROVIDER_TIMEOUT_SECONDS")
+    provider_max_concurrency: int = Field(default=32, alias="PROVIDER_MAX_CONCURRENCY")
+    # Items per price_chunk subtask when a Celery aggregation is fanned out
+    celery_price_chunk_size: int = Field(default=25, alias="CELERY_PRICE_CHUNK_SIZE")
+
+    # Price result cache (in-process LRU in front of Redis)
+    price_cache_ttl_seconds: float = Field(default=300.0, alias="PRICE_CACHE_TTL_SECONDS")
+    price_cache_stale_seconds: float = Field(default=900.0, alias="PRICE_CACHE_STALE_SECONDS")
+    price_cache_max_entries: int = Field(default=2048, alias="PRICE_CACHE_MAX_ENTRIES")
+
+    # Price catalog ("mock" prices from the built-in table; "database" serves
+    # grocery_deals from an in-memory snapshot refreshed incrementally)
+    price_catalog_backend: str = Field(default="mock", alias="PRICE_CATALOG_BACKEND")
+    price_catalog_refresh_seconds: float = Field(default=30.0, alias="PRICE_CATALOG_REFRESH_SECONDS")
+    # Feed rows per batch (one commit each) in bulk deal ingestion
+    ingest_batch_size: int = Field(default=5000, alias="INGEST_BATCH_SIZE")
+
+    # Single-flight coalescing of identical concurrent aggregations: how long
+    # other workers wait on the one computing, and how often they check
+    single_flight_lock_seconds: float = Field(default=30.0, alias="SINGLE_FLIGHT_LOCK_SECONDS")
+    single_flight_poll_seconds: float = Field(default=0.02, alias="SINGLE_FLIGHT_POLL_SECONDS")
+
+    # Grocery text parsing (local grammar first, LLM fallback, cached)
+    parse_local_min_confidence: float = Field(default=0.8, alias="PARSE_LOCAL_MIN_CONFIDENCE")
+    parse_cache_ttl_seconds: float = Field(default=86400.0, alias="PARSE_CACHE_TTL_SECONDS")
+    parse_cache_max_entries: int = Field(default=4096, alias="PARSE_CACHE_MAX_ENTRIES")
+
+    # Cart storage ("memory" is per-process; "redis" is shared by all workers)
+    cart_store_backend: str = Field(default="memory", alias="CART_STORE_BACKEND")
+    cart_anonymous_ttl_seconds: int = Field(default=86400, alias="CART_ANONYMOUS_TTL_SECONDS")
+
+    # Workflow checkpoints for resumable retries (same backends as carts)
+    workflow_checkpoint_backend: str = Field(default="memory", alias="WORKFLOW_CHECKPOINT_BACKEND")
+    workflow_checkpoint_ttl_seconds: int = Field(default=86400, alias="WORKFLOW_CHECKPOINT_TTL_SECONDS")
+    workflow_checkpoint_max_entries: int = Field(default=4096, alias="WORKFLOW_CHECKPOINT_MAX_ENTRIES")
+
+    # Batch workflows: how many run at once per request
+    workflow_batch_max_concurrency: int = Field(default=8, alias="WORKFLOW_BATCH_MAX_CONCURRENCY")
+
     # Frontend CORS - using string first, then converting
     frontend_origins_str: str = Field(default="http://localhost:3000,http://localhost:5173,http://localhost:8080", alias="FRONTEND_ORIGINS")
     
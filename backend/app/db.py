@@ -1,18 +1,68 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
-    future=True,
-)
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    # WAL lets readers run alongside the single writer, and NORMAL syncs only
+    # at checkpoints (still crash-safe in WAL mode) instead of every commit
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def create_db_engine(database_url: Optional[str] = None) -> Engine:
+    """
+    Engine for the API and the Celery workers (DATABASE_URL unless given).
+
+    Connections are pre-pinged so ones dropped by the server or a proxy are
+    replaced transparently. Server databases get the DB_POOL_* sizing and
+    recycling; SQLite files run in WAL mode with synchronous=NORMAL.
+    """
+    url = make_url(database_url or settings.database_url)
+    options: Dict[str, Any] = {"future": True, "pool_pre_ping": True}
+    sqlite = url.get_backend_name() == "sqlite"
+    in_memory = sqlite and url.database in (None, "", ":memory:")
+
+    if sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+    if not in_memory:
+        # In-memory SQLite uses a single shared connection, so no pool sizing
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_recycle=settings.db_pool_recycle_seconds,
+            pool_timeout=settings.db_pool_timeout_seconds,
+        )
+
+    db_engine = create_engine(url, **options)
+    if sqlite:
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
 Base = declarative_base()
 
 
+def create_schema(bind: Engine) -> None:
+    """
+    Create missing tables, and missing indexes on existing tables (create_all
+    only creates the indexes of the tables it creates).
+    """
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .agents.agent_a_deal_scout import PriceAnalysis, _item_key
+from .agents.deal_catalog import PlatformInfo, deal_price, platform_info
+from .models.entities import GroceryDeal, GroceryItem, GroceryList, GroceryListItem, GroceryPlatform, User
+from .schemas.groceries import GroceryItem as QueryItem, PriceQuery, ProviderPrice
+
+
+@dataclass
+class SavedListPrices:
+    list_id: int
+    name: str
+    analysis: PriceAnalysis
+
+
+class GroceryListRepository:
+    """
+    Saved grocery lists, read with their items, deals and platforms.
+
+    Walking GroceryList.items -> item -> deals -> platform through the
+    relationships lazy-loads once per row; price_list() reads the whole
+    list in one outer-joined query instead (served by the grocery_list_items
+    and grocery_deals composite indexes).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _list_rows(self, list_id: int, owner_email: str):
+        return self.db.execute(
+            select(
+                GroceryList.name.label("list_name"),
+                GroceryListItem.id.label("list_item_id"),
+                GroceryListItem.quantity,
+                GroceryItem.name.label("item_name"),
+                GroceryItem.category,
+                GroceryItem.brand,
+                GroceryItem.unit,
+                GroceryDeal.id.label("deal_id"),
+                GroceryDeal.current_price,
+                GroceryDeal.original_price,
+                GroceryDeal.discount_percentage,
+                GroceryDeal.stock_available,
+                GroceryDeal.delivery_time,
+                GroceryDeal.deal_type,
+                GroceryDeal.deal_details,
+                GroceryPlatform,
+            )
+            .select_from(GroceryList)
+            .join(User, User.id == GroceryList.user_id)
+            .outerjoin(GroceryListItem, GroceryListItem.grocery_list_id == GroceryList.id)
+            .outerjoin(GroceryItem, GroceryItem.id == GroceryListItem.item_id)
+            .outerjoin(GroceryDeal, GroceryDeal.item_id == GroceryItem.id)
+            .outerjoin(GroceryPlatform, GroceryPlatform.id == GroceryDeal.platform_id)
+            .where(GroceryList.id == list_id, User.email == owner_email)
+            # Within an item and platform, the latest deal comes last (undated ones first, on any backend)
+            .order_by(
+                GroceryListItem.id,
+                GroceryDeal.platform_id,
+                GroceryDeal.last_updated.asc().nulls_first(),
+                GroceryDeal.id,
+            )
+        ).all()
+
+    def price_list(self, list_id: int, owner_email: str) -> Optional[SavedListPrices]:
+        """
+        Prices of every item of a saved list from its latest deals, or None
+        if there is no such list owned by the user with owner_email
+        """
+        rows = self._list_rows(list_id, owner_email)
+        if not rows:
+            return None
+
+        items: Dict[int, QueryItem] = {}
+        # (list item, platform key) -> latest price
+        prices: Dict[Tuple[int, str], ProviderPrice] = {}
+        platforms: Dict[int, PlatformInfo] = {}
+        for row in rows:
+            if row.list_item_id is None:
+                continue  # empty list
+            if row.list_item_id not in items:
+                items[row.list_item_id] = QueryItem(
+                    name=row.item_name,
+                    quantity=max(1, math.ceil(row.quantity or 1)),
+                    unit=row.unit,
+                    category=row.category,
+                    preferred_brand=row.brand,
+                )
+            platform = row.GroceryPlatform
+            if row.deal_id is None or platform is None or not platform.is_active:
+                continue
+            info = platforms.get(platform.id)
+            if info is None:
+                info = platforms[platform.id] = platform_info(platform)
+            prices[(row.list_item_id, info.key)] = deal_price(
+                row.item_name,
+                info,
+                row.category,
+                deal_id=row.deal_id,
+                unit_price=row.current_price,
+                original_price=row.original_price,
+                discount_percent=row.discount_percentage,
+                in_stock=True if row.stock_available is None else row.stock_available,
+                eta_minutes=row.delivery_time,
+                deal_type=row.deal_type,
+                deal_details=row.deal_details,
+            )
+
+        by_list_item: Dict[int, List[ProviderPrice]] = {}
+        for (list_item_id, _), price in prices.items():
+            by_list_item.setdefault(list_item_id, []).append(price)
+        item_prices: Dict[str, List[ProviderPrice]] = {}
+        for list_item_id, item in items.items():
+            # Repeated entries of the same item share one row of prices
+            item_prices.setdefault(_item_key(item), by_list_item.get(list_item_id, []))
+
+        query = PriceQuery(items=list(items.values()))
+        return SavedListPrices(list_id, rows[0].list_name, PriceAnalysis(query, item_prices))
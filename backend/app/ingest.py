@@ -0,0 +1,377 @@
+"""
+Bulk ingestion of provider price feeds into grocery_deals.
+
+    python -m app.ingest feed.csv [feed2.jsonl.gz ...] [--batch-size N]
+
+Feeds are CSV (with a header row) or JSON Lines, optionally gzipped. Each
+row is one deal:
+
+    item_name, platform, current_price       required ("name", "item" and
+                                             "price" are accepted too)
+    category, brand, unit                    used when the item is created
+    base_url                                 used when the platform is created
+    original_price, discount_percentage,
+    stock_available, delivery_time,
+    deal_type, deal_details                  deal fields (deal_details is a
+                                             JSON object, or JSON text in CSV)
+
+Rows are read and written batch by batch, so memory depends on the batch
+size and the number of distinct items and platforms, not on the feed size.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from .agents.deal_catalog import platform_key
+from .agents.normalize import normalize_item_name, normalize_unit
+from .config import settings
+from .db import SessionLocal
+from .models.entities import GroceryDeal, GroceryItem, GroceryPlatform
+
+logger = logging.getLogger(__name__)
+
+FEED_FORMATS = ("csv", "jsonl")
+
+# Invalid rows reported individually before only being counted
+_MAX_LOGGED_REJECTS = 20
+
+_TRUE = {"1", "true", "yes", "y", "t"}
+_FALSE = {"0", "false", "no", "n", "f"}
+
+
+@dataclass
+class IngestReport:
+    rows: int = 0
+    rejected: int = 0
+    items_created: int = 0
+    platforms_created: int = 0
+    deals_inserted: int = 0
+    deals_updated: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "rows_per_second": round(self.rows_per_second, 1)}
+
+
+def feed_format(path: str) -> str:
+    """Feed format from the file name (ignoring a .gz suffix)"""
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    raise ValueError(f"Cannot tell the feed format of {path!r}; pass one of {FEED_FORMATS}")
+
+
+def _open(path: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_feed(stream: IO[str], fmt: str) -> Iterator[Union[Dict[str, Any], str]]:
+    """
+    Rows of a feed, one at a time: dicts for CSV, undecoded lines for JSONL
+    (parse_row decodes them, so a malformed line rejects only that row)
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield line
+    else:
+        raise ValueError(f"Unknown feed format {fmt!r}; expected one of {FEED_FORMATS}")
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value: Any) -> Optional[float]:
+    value = _text(value)
+    if value is None:
+        return None
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"not a finite number: {value!r}")
+    return number
+
+
+def _flag(value: Any) -> Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if not value:
+        return None
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _details(value: Any) -> Optional[Dict[str, Any]]:
+    if value is None or isinstance(value, dict):
+        return value
+    value = str(value).strip()
+    return json.loads(value) if value else None
+
+
+@dataclass
+class FeedRow:
+    item_name: str
+    brand: Optional[str]
+    category: str
+    unit: str
+    platform: str
+    base_url: Optional[str]
+    deal: Dict[str, Any]
+
+    @property
+    def item_key(self) -> Tuple[str, str]:
+        return normalize_item_name(self.item_name), normalize_item_name(self.brand or "")
+
+    @property
+    def platform_key(self) -> str:
+        return platform_key(self.platform)
+
+
+def parse_row(raw: Union[Dict[str, Any], str]) -> FeedRow:
+    """Validate one feed row (a dict, or a JSON object line); raises ValueError"""
+    if isinstance(raw, str):
+        raw = json.loads(raw)  # JSONDecodeError is a ValueError
+    if not isinstance(raw, dict):
+        raise ValueError(f"expected an object, got {type(raw).__name__}")
+    item_name = _text(raw.get("item_name") or raw.get("name") or raw.get("item"))
+    platform = _text(raw.get("platform"))
+    price = _number(raw.get("current_price", raw.get("price")))
+    if not item_name or not platform or price is None:
+        raise ValueError("item_name, platform and current_price are required")
+    if price < 0:
+        raise ValueError(f"negative price {price}")
+
+    delivery_time = _number(raw.get("delivery_time"))
+    stock = _flag(raw.get("stock_available"))
+    return FeedRow(
+        item_name=item_name,
+        brand=_text(raw.get("brand")),
+        category=normalize_item_name(_text(raw.get("category")) or "general"),
+        unit=normalize_unit(_text(raw.get("unit"))),
+        platform=platform,
+        base_url=_text(raw.get("base_url")),
+        deal={
+            "current_price": price,
+            "original_price": _number(raw.get("original_price")),
+            "discount_percentage": _number(raw.get("discount_percentage")),
+            "stock_available": True if stock is None else stock,
+            "delivery_time": int(delivery_time) if delivery_time is not None else None,
+            "deal_type": _text(raw.get("deal_type")),
+            "deal_details": _details(raw.get("deal_details")),
+        },
+    )
+
+
+class IdMap:
+    """
+    Item and platform ids by natural key, loaded once and extended as the
+    feed introduces new ones (created a batch at a time).
+    """
+
+    def __init__(self, db: Session):
+        self.items: Dict[Tuple[str, str], int] = {}
+        self.platforms: Dict[str, int] = {}
+        for item_id, name, brand in db.execute(
+            select(GroceryItem.id, GroceryItem.name, GroceryItem.brand).order_by(GroceryItem.id)
+        ):
+            self.items.setdefault((normalize_item_name(name), normalize_item_name(brand or "")), item_id)
+        for platform_id, name in db.execute(
+            select(GroceryPlatform.id, GroceryPlatform.name).order_by(GroceryPlatform.id)
+        ):
+            self.platforms.setdefault(platform_key(name), platform_id)
+
+    def resolve(self, db: Session, rows: List[FeedRow], report: IngestReport) -> None:
+        """Create the platforms and items of rows that are not known yet"""
+        new_platforms: Dict[str, FeedRow] = {}
+        new_items: Dict[Tuple[str, str], FeedRow] = {}
+        for row in rows:
+            if row.platform_key not in self.platforms:
+                new_platforms.setdefault(row.platform_key, row)
+            if row.item_key not in self.items:
+                new_items.setdefault(row.item_key, row)
+
+        if new_platforms:
+            keys = list(new_platforms)
+            created = db.execute(
+                insert(GroceryPlatform).returning(GroceryPlatform.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "name": new_platforms[key].platform,
+                        "base_url": new_platforms[key].base_url or f"https://{key.replace('_', '')}.com",
+                    }
+                    for key in keys
+                ],
+            ).scalars().all()
+            self.platforms.update(zip(keys, created))
+            report.platforms_created += len(keys)
+
+        if new_items:
+            keys = list(new_items)
+            created = db.execute(
+                insert(GroceryItem).returning(GroceryItem.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "name": new_items[key].item_name,
+                        "brand": new_items[key].brand,
+                        "category": new_items[key].category,
+                        "unit": new_items[key].unit,
+                    }
+                    for key in keys
+                ],
+            ).scalars().all()
+            self.items.update(zip(keys, created))
+            report.items_created += len(keys)
+
+
+def _upsert_deals(db: Session, ids: IdMap, rows: List[FeedRow], report: IngestReport) -> None:
+    stamp = datetime.utcnow()
+    # Last row wins when a batch prices the same item on a platform twice
+    deals: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for row in rows:
+        item_id, platform_id = ids.items[row.item_key], ids.platforms[row.platform_key]
+        deals[(item_id, platform_id)] = {
+            "item_id": item_id,
+            "platform_id": platform_id,
+            **row.deal,
+            "last_updated": stamp,
+        }
+
+    # Newest existing deal per (item, platform) is the one updated
+    existing: Dict[Tuple[int, int], int] = {}
+    item_ids = sorted({item_id for item_id, _ in deals})
+    for item_id, platform_id, deal_id in db.execute(
+        select(GroceryDeal.item_id, GroceryDeal.platform_id, func.max(GroceryDeal.id))
+        .where(GroceryDeal.item_id.in_(item_ids))
+        .group_by(GroceryDeal.item_id, GroceryDeal.platform_id)
+    ):
+        existing[(item_id, platform_id)] = deal_id
+
+    updates = [{"id": existing[cell], **deal} for cell, deal in deals.items() if cell in existing]
+    inserts = [deal for cell, deal in deals.items() if cell not in existing]
+    if updates:
+        db.execute(update(GroceryDeal), updates)
+    if inserts:
+        db.execute(GroceryDeal.__table__.insert(), inserts)
+    report.deals_updated += len(updates)
+    report.deals_inserted += len(inserts)
+
+
+def ingest_rows(
+    rows: Iterable[Union[Dict[str, Any], str]],
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: Optional[int] = None,
+    report: Optional[IngestReport] = None,
+) -> IngestReport:
+    """Upsert deals from raw feed rows, committing every batch_size rows"""
+    batch_size = batch_size or settings.ingest_batch_size
+    report = report or IngestReport()
+    started = time.perf_counter()
+
+    db = session_factory()
+    try:
+        ids = IdMap(db)
+        batch: List[FeedRow] = []
+
+        def flush() -> None:
+            ids.resolve(db, batch, report)
+            _upsert_deals(db, ids, batch, report)
+            db.commit()
+            report.batches += 1
+            report.seconds = time.perf_counter() - started
+            logger.info(
+                "ingest: %d rows (%d rejected), %.0f rows/s",
+                report.rows, report.rejected, report.rows_per_second,
+            )
+            batch.clear()
+
+        for line, raw in enumerate(rows, start=1):
+            report.rows += 1
+            try:
+                batch.append(parse_row(raw))
+            except (ValueError, TypeError, OverflowError) as exc:
+                report.rejected += 1
+                if report.rejected <= _MAX_LOGGED_REJECTS:
+                    logger.warning("ingest: row %d rejected: %s", line, exc)
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def ingest_feed(
+    path: str,
+    fmt: Optional[str] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: Optional[int] = None,
+) -> IngestReport:
+    """Stream one feed file into grocery_deals"""
+    fmt = fmt or feed_format(path)
+    with _open(path) as stream:
+        report = ingest_rows(read_feed(stream, fmt), session_factory, batch_size)
+    logger.info("ingest: %s done: %s", path, report.as_dict())
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.ingest", description="Bulk-load provider price feeds into grocery_deals")
+    parser.add_argument("feeds", nargs="+", help="CSV or JSONL feed files (optionally .gz)")
+    parser.add_argument("--format", choices=FEED_FORMATS, help="feed format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=None, help=f"rows per batch (default: INGEST_BATCH_SIZE, {settings.ingest_batch_size})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for path in args.feeds:
+        report = ingest_feed(path, args.format, batch_size=args.batch_size)
+        print(
+            f"{path}: {report.rows} rows in {report.seconds:.1f}s ({report.rows_per_second:.0f} rows/s), "
+            f"{report.deals_inserted} deals inserted, {report.deals_updated} updated, "
+            f"{report.items_created} items and {report.platforms_created} platforms created, "
+            f"{report.rejected} rejected"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
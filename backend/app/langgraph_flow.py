@@ -1,32 +1,190 @@
-from typing import Dict, Any
+from __future__ import annotations
+
+import operator
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List, Optional, Tuple, TypedDict
+
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 
-# Simple workflow coordinator - the real work gets done in background tasks
-# Grocery pipeline: scout -> cart -> checkout
+from .schemas.groceries import (
+    CartPlan,
+    CheckoutRequest,
+    CheckoutResponse,
+    PriceQuery,
+    PriceResult,
+)
+from .agents.agent_a_deal_scout import DealScoutAgent, PriceAnalysis
+from .agents.workflow_checkpoints import dump_scout, load_scout
+from .agents.agent_b_cart_builder import CartBuilderAgent
+from .agents.agent_c_order_executor import OrderExecutorAgent
+from .security.rbac import check_grocery_delegation
+from .tracing import span
+
+# Grocery pipeline:
+#
+#   scout_node -+-> cart_node -> checkout_node (only with a checkout request)
+#               +-> category_analysis_node
+#               +-> platform_strengths_node
+#               +-> recommendations_node
+#
+# The analysis branches only read the scout's PriceAnalysis, so LangGraph runs
+# them in the same step as cart planning. Scout, cart and checkout output is
+# checkpointed by the overseer (see workflow_checkpoints); a stage whose
+# checkpoint already exists is restored instead of run again.
+
+
+def _merge(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    return {**left, **right}
+
+
+class WorkflowState(TypedDict, total=False):
+    query: PriceQuery
+    checkout_request: Optional[CheckoutRequest]
+    analysis: PriceAnalysis
+    price_results: PriceResult
+    cart_plan: CartPlan
+    final_order: Optional[CheckoutResponse]
+    # Written by the parallel branches, hence the reducers
+    insights: Annotated[Dict[str, Any], _merge]
+    errors: Annotated[List[str], operator.add]
+
+
+class StageFailed(Exception):
+    """A checkpointed stage (scout, cart or checkout) raised"""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(str(error))
+        self.stage = stage
+
+
+def _runtime(config: RunnableConfig) -> Tuple[Any, Dict[str, Any]]:
+    """The OverseerAgent running the workflow and its checkpoint"""
+    configurable = config["configurable"]
+    return configurable["overseer"], configurable["checkpoint"]
+
 
+def _ran(config: RunnableConfig, metrics: Any) -> None:
+    # Kept outside the graph state so the overseer still has them if a later stage fails
+    config["configurable"]["agent_metrics"].append(metrics)
 
-def scout_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    # Price aggregation done asynchronously; move to cart planning
-    return {**state, "next": "cart_node"}
 
+def scout_node(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
+    overseer, checkpoint = _runtime(config)
+    stages = checkpoint["stages"]
+    if "scout" in stages:
+        analysis, price_results = load_scout(stages["scout"], state["query"])
+        return {"analysis": analysis, "price_results": price_results}
+    try:
+        scout_agent = DealScoutAgent(overseer._build_default_providers())
+        analysis, metrics = overseer._execute_with_monitoring("DealScoutAgent", scout_agent.analyze, state["query"])
+        price_results = analysis.result
+    except Exception as e:
+        raise StageFailed("scout", e) from e
+    stages["scout"] = dump_scout(analysis, price_results)
+    overseer._save_checkpoint(checkpoint)
+    _ran(config, metrics)
+    return {"analysis": analysis, "price_results": price_results}
 
-def cart_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    # Cart planning completed; proceed to checkout
-    return {**state, "next": "checkout_node"}
 
+def cart_node(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
+    overseer, checkpoint = _runtime(config)
+    stages = checkpoint["stages"]
+    if "cart" in stages:
+        return {"cart_plan": CartPlan.model_validate(stages["cart"])}
+    try:
+        cart_plan, metrics = overseer._execute_with_monitoring(
+            "CartBuilderAgent", CartBuilderAgent().build_cart, state["analysis"].prices
+        )
+    except Exception as e:
+        raise StageFailed("cart", e) from e
+    stages["cart"] = cart_plan.model_dump(mode="json")
+    overseer._save_checkpoint(checkpoint)
+    _ran(config, metrics)
+    return {"cart_plan": cart_plan}
 
-def checkout_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    return {**state, "done": True}
+
+def checkout_node(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
+    overseer, checkpoint = _runtime(config)
+    stages = checkpoint["stages"]
+    if "checkout" in stages:
+        return {"final_order": CheckoutResponse.model_validate(stages["checkout"])}
+    cart_plan = state["cart_plan"]
+    checkout_request = state["checkout_request"]
+    try:
+        checkout_request.items = cart_plan.options[cart_plan.best_option_index].items
+        checkout_request.provider = cart_plan.options[cart_plan.best_option_index].provider
+
+        # Check delegation requirements before checkout
+        order_value = sum(item.unit_price for item in checkout_request.items)
+        required_role = check_grocery_delegation(order_value, "shopper")  # Default role
+
+        if required_role and required_role != "shopper":
+            pass
+            # In production, this would create an approval flow
+
+        final_order, metrics = overseer._execute_with_monitoring(
+            "OrderExecutorAgent",
+            OrderExecutorAgent().checkout,
+            checkout_request,
+            "shopper"  # Pass user role for delegation check
+        )
+    except Exception as e:
+        raise StageFailed("checkout", e) from e
+    stages["checkout"] = final_order.model_dump(mode="json")
+    overseer._save_checkpoint(checkpoint)
+    _ran(config, metrics)
+    return {"final_order": final_order}
+
+
+def _insight(name: str):
+    """
+    Analysis branch reading one PriceAnalysis view. Insights are advisory:
+    a failing branch is reported in the workflow errors, not as a failed stage.
+    """
+    def node(state: WorkflowState) -> Dict[str, Any]:
+        try:
+            with span(f"insights.{name}"):
+                value = getattr(state["analysis"], name)
+        except Exception as e:
+            return {"insights": {name: None}, "errors": [f"{name} failed: {e}"]}
+        return {"insights": {name: value}}
+    node.__name__ = f"{name}_node"
+    return node
+
+
+category_analysis_node = _insight("category_analysis")
+platform_strengths_node = _insight("platform_strengths")
+recommendations_node = _insight("recommendations")
+
+
+def route_after_cart(state: WorkflowState, config: RunnableConfig) -> str:
+    _, checkpoint = _runtime(config)
+    if state.get("checkout_request") or "checkout" in checkpoint["stages"]:
+        return "checkout_node"
+    return END
 
 
 def build_graph():
-    g = StateGraph(dict)
+    g = StateGraph(WorkflowState)
     g.add_node("scout_node", scout_node)
     g.add_node("cart_node", cart_node)
     g.add_node("checkout_node", checkout_node)
+    g.add_node("category_analysis_node", category_analysis_node)
+    g.add_node("platform_strengths_node", platform_strengths_node)
+    g.add_node("recommendations_node", recommendations_node)
 
     g.set_entry_point("scout_node")
     g.add_edge("scout_node", "cart_node")
-    g.add_edge("cart_node", "checkout_node")
+    for branch in ("category_analysis_node", "platform_strengths_node", "recommendations_node"):
+        g.add_edge("scout_node", branch)
+        g.add_edge(branch, END)
+    g.add_conditional_edges("cart_node", route_after_cart, {"checkout_node": "checkout_node", END: END})
     g.add_edge("checkout_node", END)
     return g.compile()
+
+
+@lru_cache(maxsize=1)
+def get_workflow_graph():
+    """The compiled workflow graph, built once per process (warmed at startup)"""
+    return build_graph()
@@ -1,7 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
-from .db import Base, engine
+from .audit import audit_writer
+from .agents.deal_catalog import deal_catalog, use_deal_catalog
+from .db import create_schema, engine
+from .metrics import metrics_registry, render_metrics
+from .langgraph_flow import get_workflow_graph
 from starlette.middleware.sessions import SessionMiddleware
 
 from .routers import auth as auth_router
@@ -25,7 +29,19 @@ app.add_middleware(SessionMiddleware, secret_key="change-me-in-env")
 
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
+    # Compile the workflow graph once, before the first request needs it
+    get_workflow_graph()
+    audit_writer.start()
+    if use_deal_catalog():
+        deal_catalog.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # Write out audit events still queued
+    audit_writer.stop()
+    deal_catalog.stop()
 
 
 app.include_router(auth_router.router, prefix="/auth", tags=["auth"])
@@ -35,3 +51,10 @@ app.include_router(grocery_router.router, prefix="/grocery", tags=["grocery"])
 @app.get("/health")
 async def health():
     return {"status": "ok", "env": settings.env}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics(metrics_registry)
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Agents the overseer reports on, in pipeline order
+AGENT_NAMES = ("DealScoutAgent", "CartBuilderAgent", "OrderExecutorAgent")
+
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Ring buffer sizes: recent workflows kept for analytics, and recent runs
+# per agent (health status looks at the last five)
+WORKFLOW_HISTORY_SIZE = 1000
+AGENT_RECENT_RUNS = 5
+
+REPORTED_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles with bounded relative error (DDSketch-style).
+
+    Values are counted in logarithmic buckets whose bounds grow by a factor
+    gamma, so every reported quantile is within relative_accuracy of the
+    true value. Memory depends on the value range, not on how many values
+    were added, and is capped at max_buckets by merging the lowest buckets
+    (which only loses accuracy for the smallest values).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0  # values too small for a log bucket
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 1e-9:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Bucket midpoint, in relative terms
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float] = REPORTED_QUANTILES) -> Dict[str, float]:
+        """{"p50": ..., "p95": ..., "p99": ...}"""
+        return {f"p{round(q * 100):d}": round(self.quantile(q), 3) for q in qs}
+
+
+@dataclass
+class AgentStats:
+    """Running totals for one agent; O(1) to update and to read"""
+    executions: int = 0
+    successes: int = 0
+    total_time_ms: float = 0.0
+    latency_ms: QuantileSketch = field(default_factory=QuantileSketch)
+    recent: Deque[Any] = field(default_factory=lambda: deque(maxlen=AGENT_RECENT_RUNS))
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.executions if self.executions else 0
+
+    @property
+    def avg_execution_time(self) -> float:
+        return self.total_time_ms / self.executions if self.executions else 0
+
+
+def _outcome(success: bool) -> str:
+    return "success" if success else "failure"
+
+
+class MetricsRegistry:
+    """
+    Process-wide agent and workflow metrics.
+
+    Prometheus counters and latency histograms, labelled by agent and
+    outcome, back the /metrics endpoint. Counters and histogram buckets add
+    up across processes, so with PROMETHEUS_MULTIPROC_DIR set (see
+    render_metrics) every worker's samples are aggregated into one scrape.
+
+    Alongside them the registry keeps the in-process view OverseerAgent
+    analytics read, so every OverseerAgent in the process shares it:
+    ring buffers of recent workflows and agent runs, running totals, and
+    quantile sketches of agent and workflow latency. Recording and reading
+    are constant time however long the process has been up.
+    """
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None, history_size: int = WORKFLOW_HISTORY_SIZE):
+        self.prometheus = registry or CollectorRegistry(auto_describe=True)
+        self.agent_runs = Counter(
+            "grocery_agent_runs_total",
+            "Agent executions",
+            ["agent", "outcome"],
+            registry=self.prometheus,
+        )
+        self.agent_latency = Histogram(
+            "grocery_agent_latency_seconds",
+            "Agent execution time",
+            ["agent", "outcome"],
+            buckets=LATENCY_BUCKETS_SECONDS,
+            registry=self.prometheus,
+        )
+        self.workflow_runs = Counter(
+            "grocery_workflow_runs_total",
+            "Scout -> cart -> checkout workflows",
+            ["outcome"],
+            registry=self.prometheus,
+        )
+        self.workflow_latency = Histogram(
+            "grocery_workflow_latency_seconds",
+            "End-to-end workflow time",
+            ["outcome"],
+            buckets=LATENCY_BUCKETS_SECONDS,
+            registry=self.prometheus,
+        )
+        self.workflow_cost_savings = Counter(
+            "grocery_workflow_cost_savings_rupees_total",
+            "Cost savings of successful workflows",
+            registry=self.prometheus,
+        )
+
+        self._lock = threading.Lock()
+        self.workflow_history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.workflow_latency_ms = QuantileSketch()
+        self.agent_stats: Dict[str, AgentStats] = {name: AgentStats() for name in AGENT_NAMES}
+        self.workflow_stats: Dict[str, Any] = {
+            "total_workflows": 0,
+            "successful_workflows": 0,
+            "failed_workflows": 0,
+            "total_cost_savings": 0.0,
+            "avg_execution_time": 0.0,
+        }
+        self._total_execution_time = 0.0
+
+    def record_agent(self, metrics: Any) -> None:
+        """Record one agent execution (an AgentMetrics)"""
+        outcome = _outcome(metrics.success)
+        self.agent_runs.labels(metrics.agent_name, outcome).inc()
+        self.agent_latency.labels(metrics.agent_name, outcome).observe(metrics.execution_time_ms / 1000)
+        with self._lock:
+            stats = self.agent_stats.setdefault(metrics.agent_name, AgentStats())
+            stats.executions += 1
+            stats.successes += 1 if metrics.success else 0
+            stats.total_time_ms += metrics.execution_time_ms
+            stats.latency_ms.add(metrics.execution_time_ms)
+            stats.recent.append(metrics)
+
+    def record_workflow(self, entry: Dict[str, Any]) -> None:
+        """Record one workflow run: {timestamp, success, execution_time_ms, cost_savings, errors}"""
+        outcome = _outcome(entry["success"])
+        self.workflow_runs.labels(outcome).inc()
+        self.workflow_latency.labels(outcome).observe(entry["execution_time_ms"] / 1000)
+        if entry["success"]:
+            self.workflow_cost_savings.inc(max(0.0, entry["cost_savings"]))
+
+        with self._lock:
+            self.workflow_history.append(entry)
+            self.workflow_latency_ms.add(entry["execution_time_ms"])
+            stats = self.workflow_stats
+            stats["total_workflows"] += 1
+            if entry["success"]:
+                stats["successful_workflows"] += 1
+                stats["total_cost_savings"] += entry["cost_savings"]
+            else:
+                stats["failed_workflows"] += 1
+            self._total_execution_time += entry["execution_time_ms"]
+            stats["avg_execution_time"] = self._total_execution_time / stats["total_workflows"]
+
+    def recent_workflows(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            start = max(0, len(self.workflow_history) - limit)
+            return list(islice(self.workflow_history, start, None))
+
+    def agent_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent totals, latency quantiles and recent runs, read under the lock"""
+        with self._lock:
+            return {
+                name: {
+                    "total_executions": stats.executions,
+                    "success_rate": stats.success_rate,
+                    "avg_execution_time": stats.avg_execution_time,
+                    "latency_ms": stats.latency_ms.quantiles(),
+                    "recent": list(stats.recent),
+                }
+                for name, stats in self.agent_stats.items()
+            }
+
+
+def render_metrics(registry: MetricsRegistry) -> Tuple[bytes, str]:
+    """
+    Prometheus text exposition. When PROMETHEUS_MULTIPROC_DIR is set (it
+    must be a real environment variable, set before the workers start),
+    samples from all worker processes are merged; otherwise this process's
+    registry is rendered.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        merged = CollectorRegistry()
+        multiprocess.MultiProcessCollector(merged)
+        return generate_latest(merged), CONTENT_TYPE_LATEST
+    return generate_latest(registry.prometheus), CONTENT_TYPE_LATEST
+
+
+metrics_registry = MetricsRegistry()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer, Float, ForeignKey, Text, Boolean, JSON
+from sqlalchemy import Column, String, DateTime, Integer, Float, ForeignKey, Text, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from ..db import Base
 
@@ -51,12 +51,17 @@ class GroceryDeal(Base):
     delivery_time = Column(Integer, nullable=True)  # in minutes
     deal_type = Column(String, nullable=True)  # combo, flash_sale, bulk_discount, etc.
     deal_details = Column(JSON, nullable=True)  # Extra details about the deal
-    last_updated = Column(DateTime, default=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow, index=True)  # catalog refresh watermark
     
     # Relationships
     item = relationship("GroceryItem", back_populates="deals")
     platform = relationship("GroceryPlatform")
 
+    __table_args__ = (
+        # Deals of an item (list pricing), and of an item on one platform (ingest upserts)
+        Index("ix_grocery_deals_item_platform", "item_id", "platform_id"),
+    )
+
 
 class GroceryList(Base):
     __tablename__ = "grocery_lists"
@@ -83,6 +88,10 @@ class GroceryListItem(Base):
     grocery_list = relationship("GroceryList", back_populates="items")
     item = relationship("GroceryItem")
 
+    __table_args__ = (
+        Index("ix_grocery_list_items_list_item", "grocery_list_id", "item_id"),
+    )
+
 
 class DealAnalysis(Base):
     __tablename__ = "deal_analyses"
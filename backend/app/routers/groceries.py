@@ -1,18 +1,30 @@
+import json
 from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends
-
-from ..security.dependencies import require_scopes, get_user_id, get_optional_user_id
-from ..schemas.groceries import PriceQuery, PriceResult, CartPlan, CheckoutRequest, CheckoutResponse, GroceryItem
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..security.dependencies import require_scopes, get_current_user, get_user_id, get_optional_user_id
+from ..security.descope_auth import DescopeUser
+from ..schemas.groceries import PriceQuery, PriceResult, CartPlan, CheckoutRequest, CheckoutResponse, GroceryItem, SavedListPriceResult, WorkflowBatchRequest
 from ..agents import DealScoutAgent, CartBuilderAgent, OrderExecutorAgent, OverseerAgent, MockProvider
 from ..agents.agent_b_cart_builder import (
     cart_add_or_update,
+    cart_add_many,
     cart_get,
     cart_remove,
     cart_clear,
 )
-from ..agents.agent_a_deal_scout import GroceryTextParser
-import re
+from ..agents.agent_a_deal_scout import GroceryTextParser, CATALOG_INDEX
+from ..agents.grocery_grammar import parse_grocery_text
+from ..agents.price_cache import price_cache
+from ..agents.deal_catalog import deal_catalog, use_deal_catalog
+from ..agents.workflow_checkpoints import WorkflowBusy
+from ..db import get_db
+from ..grocery_lists import GroceryListRepository
+from ..tracing import chrome_trace
 from fastapi import Request
 
 router = APIRouter()
@@ -20,6 +32,8 @@ router = APIRouter()
 
 def build_default_providers():
     """Build providers with realistic platform configurations"""
+    if use_deal_catalog():
+        return deal_catalog.providers()
     return [
         MockProvider("amazon_fresh"),
         MockProvider("instacart"),
@@ -29,8 +43,26 @@ def build_default_providers():
 
 @router.post("/prices", response_model=PriceResult)
 async def aggregate_prices(body: PriceQuery) -> PriceResult:
-    scout = DealScoutAgent(build_default_providers())
-    return scout.aggregate_prices(body)
+    scout = DealScoutAgent(build_default_providers(), cache=price_cache)
+    return await scout.aggregate_prices_async(body)
+
+
+@router.get("/lists/{list_id}/prices", response_model=SavedListPriceResult)
+def price_saved_list(
+    list_id: int,
+    db: Session = Depends(get_db),
+    user: DescopeUser = Depends(get_current_user),
+) -> SavedListPriceResult:
+    """Price one of the caller's saved grocery lists from grocery_deals (one query for the whole list)"""
+    # Lists are owned by local users, matched to the Descope user by email
+    saved = GroceryListRepository(db).price_list(list_id, user.email) if user.email else None
+    if saved is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Grocery list not found")
+    return SavedListPriceResult(
+        **saved.analysis.result.model_dump(),
+        list_id=saved.list_id,
+        list_name=saved.name,
+    )
 
 
 # ----------------------------- CART ROUTER -----------------------------
@@ -103,103 +135,68 @@ async def parse_and_add_to_cart(payload: dict, request: Request, user_id: str =
         else:
             items = parsed or []
     except Exception as e:
-        # Fallback: simple regex-based parser
-        items = []
-        # normalize separators
-        tmp = re.sub(r" and ", ",", lower)
-        # patterns like '5 kg of rice', '2 liters milk'
-        pat = re.compile(r"(\d+)\s*(kg|kilograms|g|grams|liter|liters|l|ml|piece|pieces|pcs)?\s*(?:of\s+)?([a-zA-Z_]+)")
-        for m in pat.finditer(tmp):
-            qty = int(m.group(1))
-            unit = (m.group(2) or "piece").lower()
-            name = (m.group(3) or "").lower()
-            if name:
-                items.append({"name": name, "quantity": qty, "unit": unit})
+        # Fallback: take whatever the local grammar parser could read
+        parsed, _ = parse_grocery_text(text, CATALOG_INDEX)
+        if parsed.get("platform"):
+            provider = parsed["platform"]
+        items = parsed["items"]
     # Lists to track unavailability for UX popups
     unavailable_items: list[str] = []
     unavailable_platforms: list[str] = []
 
-    # Each item: {name, quantity, unit}
-    for it in items:
-        name = it.get("name") or ""
-        qty = int(it.get("quantity") or 1)
-        if not name:
-            continue
-        # Determine canonical provider id used by our pricing engine
-        canonical_provider = provider
-        if canonical_provider == "instamart":
-            canonical_provider = "instacart"
-
-        # Try to look up a realistic price and delivery fee using DealScoutAgent
-        unit_price = 0.0
-        delivery_fee = 0.0
-        found_any_platform = False
-        found_selected_platform = False
-        try:
-            scout = DealScoutAgent(build_default_providers())
-            grocery_item = GroceryItem(name=name, quantity=qty, unit=(it.get("unit") or "piece"), category="general")
-            q = PriceQuery(items=[grocery_item])
-            res = scout.aggregate_prices(q)
-            if res.items:
-                platforms = res.items[0].platforms
-                found_any_platform = len(platforms) > 0
-                for plat in platforms:
-                    if plat.platform == canonical_provider:
-                        unit_price = float(plat.price)
-                        delivery_fee = float(plat.delivery_fee or 0.0)
-                        found_selected_platform = True
-                        break
-        except Exception as e:
-            pass
+    # Determine canonical provider id used by our pricing engine
+    canonical_provider = provider
+    if canonical_provider == "instamart":
+        canonical_provider = "instacart"
+
+    # Each item: {name, quantity, unit}; price them all in one pass
+    grocery_items = [
+        GroceryItem(
+            name=it["name"],
+            quantity=int(it.get("quantity") or 1),
+            unit=(it.get("unit") or "piece"),
+            category="general",
+        )
+        for it in items
+        if it.get("name")
+    ]
+    try:
+        scout = DealScoutAgent(build_default_providers(), cache=price_cache)
+        analysis = await scout.analyze_async(PriceQuery(items=grocery_items))
+    except Exception:
+        analysis = None
+
+    cart_lines = []
+    added_items = []
+    available_platforms = set()
+    for it, grocery_item in zip((it for it in items if it.get("name")), grocery_items):
+        prices = analysis.prices_for(grocery_item) if analysis else []
 
         # Determine availability and decide whether to add to cart
-        if not found_any_platform:
-            unavailable_items.append(name)
+        if not prices:
+            unavailable_items.append(grocery_item.name)
             continue
-        if not found_selected_platform:
+
+        # Track which items were found and what platforms are available
+        added_items.append({
+            "name": grocery_item.name,
+            "quantity": grocery_item.quantity,
+            "unit": grocery_item.unit,
+        })
+        available_platforms.update(price.provider for price in prices)
+
+        selected = next((price for price in prices if price.provider == canonical_provider), None)
+        if selected is None:
             unavailable_platforms.append(canonical_provider)
             continue
+        cart_lines.append((
+            selected.model_copy(update={"metadata": {"parsed": True, "unit": it.get("unit")}}),
+            grocery_item.quantity,
+        ))
 
-        price_like = type("P", (), {})()
-        setattr(price_like, "provider", canonical_provider)
-        setattr(price_like, "item_name", name)
-        setattr(price_like, "unit_price", unit_price)
-        setattr(price_like, "delivery_fee", delivery_fee)
-        setattr(price_like, "delivery_eta_minutes", None)
-        setattr(price_like, "metadata", {"parsed": True, "unit": it.get("unit")})
-        cart_add_or_update(user_id, price_like, qty)
-
-    response = cart_get(user_id)
+    response = cart_add_many(user_id, cart_lines)
     response["unavailable_items"] = unavailable_items
     response["unavailable_platforms"] = list(set(unavailable_platforms))
-    
-    # Track which items were successfully added and what platforms are available
-    added_items = []
-    available_platforms = set()
-    
-    for it in items:
-        name = it.get("name") or ""
-        qty = int(it.get("quantity") or 1)
-        unit = it.get("unit") or "piece"
-        
-        # Check if this item was successfully added (not in unavailable_items)
-        if name not in unavailable_items:
-            added_items.append({
-                "name": name,
-                "quantity": qty,
-                "unit": unit
-            })
-            
-            # Get available platforms for this item
-            try:
-                q = PriceQuery(items=[GroceryItem(name=name, quantity=qty, unit=unit)])
-                res = scout.aggregate_prices(q)
-                if res.items:
-                    for platform in res.items[0].platforms:
-                        available_platforms.add(platform.platform)
-            except Exception:
-                pass
-    
     response["added_items"] = added_items
     response["available_platforms"] = list(available_platforms)
     
@@ -208,10 +205,10 @@ async def parse_and_add_to_cart(payload: dict, request: Request, user_id: str =
 
 @router.post("/cart", response_model=CartPlan)
 async def build_cart(body: PriceQuery) -> CartPlan:
-    scout = DealScoutAgent(build_default_providers())
-    prices = scout.aggregate_prices(body)
+    scout = DealScoutAgent(build_default_providers(), cache=price_cache)
+    analysis = await scout.analyze_async(body)
     builder = CartBuilderAgent()
-    return builder.build_cart(prices.items)
+    return builder.build_cart(analysis.prices)
 
 
 @router.post("/checkout", response_model=CheckoutResponse)
@@ -223,14 +220,67 @@ async def checkout(req: CheckoutRequest) -> CheckoutResponse:
 @router.post("/workflow")
 async def execute_workflow(
     query: PriceQuery, 
-    checkout_request: CheckoutRequest | None = None
+    checkout_request: CheckoutRequest | None = None,
+    trace: bool = False,
 ):
     """
     Execute the complete grocery workflow using the Overseer Agent.
     This orchestrates all three agents: Deal Scout -> Cart Builder -> Order Executor
+    With ?trace=true the result includes per-stage timing spans.
     """
     overseer = OverseerAgent()
-    result = overseer.execute_workflow(query, checkout_request)
+    result = overseer.execute_workflow(query, checkout_request, trace=trace)
+    return result
+
+
+@router.post("/workflow/trace")
+async def trace_workflow(
+    query: PriceQuery,
+    checkout_request: CheckoutRequest | None = None,
+):
+    """Run the workflow traced and return its spans as Chrome trace JSON (chrome://tracing, Perfetto)"""
+    overseer = OverseerAgent()
+    result = overseer.execute_workflow(query, checkout_request, trace=True)
+    return chrome_trace(result.spans or [])
+
+
+@router.post("/workflow/batch")
+async def execute_workflow_batch(body: WorkflowBatchRequest):
+    """
+    Run the workflow (scout and cart, no checkout) for many queries at once.
+    Items shared between queries are priced once. Results stream back as
+    NDJSON in completion order, one {"index": <query index>, ...WorkflowResult}
+    object per line.
+    """
+    overseer = OverseerAgent()
+
+    async def lines():
+        async for index, result in overseer.stream_batch(body.queries, body.max_concurrency):
+            yield json.dumps({"index": index, **jsonable_encoder(result)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/workflow/{workflow_id}")
+async def get_workflow(workflow_id: str):
+    """Status, failed stage and checkpointed stage outputs of a workflow"""
+    overseer = OverseerAgent()
+    checkpoint = overseer.get_workflow(workflow_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown workflow")
+    return checkpoint
+
+
+@router.post("/workflow/{workflow_id}/retry")
+async def retry_workflow(workflow_id: str, trace: bool = False):
+    """Resume a failed workflow from the stage that failed; completed stages are not re-run"""
+    overseer = OverseerAgent()
+    try:
+        result = overseer.retry_failed_workflow(workflow_id, trace=trace)
+    except WorkflowBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown workflow")
     return result
 
 
@@ -251,8 +301,8 @@ async def get_agent_health():
 @router.post("/compare-platforms")
 async def compare_platforms(body: PriceQuery):
     """Get detailed platform comparison with pricing analysis"""
-    scout = DealScoutAgent(build_default_providers())
-    platform_data = scout.get_platform_comparison(body)
+    scout = DealScoutAgent(build_default_providers(), cache=price_cache)
+    platform_data = (await scout.analyze_async(body)).platform_comparison
     return {
         "platforms": platform_data,
         "analysis_timestamp": datetime.utcnow().isoformat(),
@@ -264,7 +314,7 @@ async def compare_platforms(body: PriceQuery):
 async def get_best_deals(body: PriceQuery):
     """Get best deals for each item across all platforms"""
     scout = DealScoutAgent(build_default_providers())
-    best_deals = scout.get_best_deals(body)
+    best_deals = scout.analyze(body).best_deals
     return {
         "best_deals": best_deals,
         "analysis_timestamp": datetime.utcnow().isoformat()
@@ -275,7 +325,7 @@ async def get_best_deals(body: PriceQuery):
 async def get_recommendations(body: PriceQuery):
     """Get smart recommendations based on price analysis"""
     scout = DealScoutAgent(build_default_providers())
-    recommendations = scout.get_recommendations(body)
+    recommendations = scout.analyze(body).recommendations
     return {
         "recommendations": recommendations,
         "analysis_timestamp": datetime.utcnow().isoformat()
@@ -307,12 +357,11 @@ async def get_platform_strategies():
 async def get_category_analysis(body: PriceQuery):
     """Get detailed category-based pricing analysis"""
     scout = DealScoutAgent(build_default_providers())
-    category_analysis = scout._analyze_categories(body)
-    platform_strengths = scout._get_platform_strengths(body)
-    
+    analysis = scout.analyze(body)
+
     return {
-        "category_analysis": category_analysis,
-        "platform_strengths": platform_strengths,
+        "category_analysis": analysis.category_analysis,
+        "platform_strengths": analysis.platform_strengths,
         "analysis_timestamp": datetime.utcnow().isoformat()
     }
 
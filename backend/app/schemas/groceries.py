@@ -27,6 +27,11 @@ class PriceQuery(BaseModel):
     location_pin: Optional[str] = None
 
 
+class WorkflowBatchRequest(BaseModel):
+    queries: List[PriceQuery] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(None, ge=1)
+
+
 class PlatformPrice(BaseModel):
     platform: str
     price: float
@@ -48,6 +53,13 @@ class PriceResult(BaseModel):
     best_platform: str
     recommendations: List[str]
     aggregated_at: str
+    # provider -> item names whose results missed the provider deadline
+    late_results: Dict[str, List[str]] = {}
+
+
+class SavedListPriceResult(PriceResult):
+    list_id: int
+    list_name: str
 
 
 class CartOption(BaseModel):
@@ -57,6 +69,8 @@ class CartOption(BaseModel):
     delivery_fee: float
     total: float
     est_delivery_minutes: Optional[int] = None
+    # Mixed carts: "exact" is False for the solver's best found, not proven cheapest
+    metadata: Dict[str, Any] = {}
 
 
 class CartPlan(BaseModel):
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Union
+
+import ormsgpack
+from kombu.serialization import register
+
+from .schemas.groceries import CartPlan, ProviderPrice
+
+MSGPACK_SERIALIZER = "ormsgpack"
+MSGPACK_CONTENT_TYPE = "application/x-ormsgpack"
+
+_PACK_OPTIONS = ormsgpack.OPT_SERIALIZE_PYDANTIC | ormsgpack.OPT_NON_STR_KEYS
+
+
+def msgpack_dumps(obj: Any) -> bytes:
+    return ormsgpack.packb(obj, option=_PACK_OPTIONS)
+
+
+def msgpack_loads(data: Union[bytes, memoryview]) -> Any:
+    return ormsgpack.unpackb(data)
+
+
+def register_msgpack_serializer() -> None:
+    """Make the "ormsgpack" serializer available to kombu (and so to Celery)"""
+    register(
+        MSGPACK_SERIALIZER,
+        msgpack_dumps,
+        msgpack_loads,
+        content_type=MSGPACK_CONTENT_TYPE,
+        content_encoding="binary",
+    )
+
+
+# Compact wire schema for ProviderPrice lists.
+#
+# Prices from one provider repeat the same strategy metadata (platform
+# strengths, multipliers, minimum order, ...), and every price repeats its
+# field names. A packed table stores each provider's shared metadata once and
+# each price as a positional row:
+#
+#   {"v": 1,
+#    "providers": [name, ...],
+#    "shared": [{metadata common to every price of that provider}, ...],
+#    "rows": [[provider index, item_name, unit_price, currency, in_stock,
+#              delivery_fee, delivery_eta_minutes, url, {remaining metadata}], ...]}
+PACKED_PRICES_VERSION = 1
+
+PackedPrices = Dict[str, Any]
+Price = Union[ProviderPrice, Dict[str, Any]]
+
+_MISSING = object()
+
+
+def _as_dict(price: Price) -> Dict[str, Any]:
+    return price.model_dump(mode="json") if isinstance(price, ProviderPrice) else price
+
+
+def pack_prices(prices: Iterable[Price]) -> PackedPrices:
+    """Packed table for ProviderPrice models or their dumps (see unpack_prices)"""
+    dumped = [_as_dict(price) for price in prices]
+
+    providers: Dict[str, int] = {}
+    shared: List[Dict[str, Any]] = []
+    for price in dumped:
+        metadata = price.get("metadata") or {}
+        index = providers.get(price["provider"])
+        if index is None:
+            providers[price["provider"]] = len(shared)
+            shared.append(dict(metadata))
+        else:
+            common = shared[index]
+            for key in [key for key, value in common.items() if metadata.get(key, _MISSING) != value]:
+                del common[key]
+
+    rows = []
+    for price in dumped:
+        index = providers[price["provider"]]
+        common = shared[index]
+        rows.append([
+            index,
+            price["item_name"],
+            price["unit_price"],
+            price.get("currency", "INR"),
+            price.get("in_stock", True),
+            price.get("delivery_fee", 0.0),
+            price.get("delivery_eta_minutes"),
+            price.get("url"),
+            {key: value for key, value in (price.get("metadata") or {}).items() if key not in common},
+        ])
+
+    return {"v": PACKED_PRICES_VERSION, "providers": list(providers), "shared": shared, "rows": rows}
+
+
+def unpack_prices(packed: Union[PackedPrices, List[Dict[str, Any]]]) -> List[ProviderPrice]:
+    """ProviderPrice models from a packed table, or from a plain list of dumps"""
+    if isinstance(packed, list):
+        return [ProviderPrice(**price) for price in packed]
+
+    providers, shared = packed["providers"], packed["shared"]
+    # Rows come from pack_prices, so skip re-validating every field
+    return [
+        ProviderPrice.model_construct(
+            provider=providers[index],
+            item_name=item_name,
+            unit_price=unit_price,
+            currency=currency,
+            in_stock=in_stock,
+            delivery_fee=delivery_fee,
+            delivery_eta_minutes=eta,
+            url=url,
+            metadata={**shared[index], **metadata},
+        )
+        for index, item_name, unit_price, currency, in_stock, delivery_fee, eta, url, metadata in packed["rows"]
+    ]
+
+
+def dump_cart_plan(plan: CartPlan) -> Dict[str, Any]:
+    """CartPlan dump with each option's items as a packed table"""
+    return {
+        **plan.model_dump(mode="json", exclude={"options"}),
+        "options": [
+            {**option.model_dump(mode="json", exclude={"items"}), "items": pack_prices(option.items)}
+            for option in plan.options
+        ],
+    }
+
+
+def load_cart_plan(data: Dict[str, Any]) -> CartPlan:
+    return CartPlan(
+        **{key: value for key, value in data.items() if key != "options"},
+        options=[
+            {**option, "items": unpack_prices(option["items"])}
+            for option in data["options"]
+        ],
+    )
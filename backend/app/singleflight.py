@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, TypeVar
+
+import redis
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from .cache import REDIS_RETRY_AFTER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Delete the lock only if this flight still holds it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent computations of the same key.
+
+    Within a process, callers that arrive while a key is in flight await
+    the same computation (an asyncio task, or a thread event for run_sync).
+    It runs detached from the caller that started it, so one caller going
+    away does not fail the others.
+
+    Across processes, the first caller takes a Redis lock (SET NX PX) and
+    computes. The others poll for the result, which the leader hands off
+    under a short-lived key, for up to lock_seconds. If the leader fails or
+    the lock expires without a result, they compute it themselves. With
+    Redis unavailable this degrades to in-process coalescing.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        redis_url: Optional[str] = None,
+        lock_seconds: float = 30.0,
+        poll_seconds: float = 0.02,
+        handoff_seconds: float = 5.0,
+        encode: Callable[[T], Any] = lambda value: value,
+        decode: Callable[[Any], T] = lambda raw: raw,
+    ):
+        self.namespace = namespace
+        self.redis_url = redis_url
+        self.lock_seconds = lock_seconds
+        self.poll_seconds = poll_seconds
+        self.handoff_seconds = handoff_seconds
+        self.encode = encode
+        self.decode = decode
+        self.stats: Dict[str, int] = {"leader": 0, "coalesced": 0, "handoffs": 0, "fallbacks": 0}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._inflight_sync: Dict[str, "_SyncFlight"] = {}
+        self._sync_lock = threading.Lock()
+        self._redis: Optional[aioredis.Redis] = None
+        self._redis_sync: Optional[redis.Redis] = None
+        self._redis_down_until = 0.0
+
+    def _lock_key(self, key: str) -> str:
+        return f"flight:{self.namespace}:{key}:lock"
+
+    def _result_key(self, key: str) -> str:
+        return f"flight:{self.namespace}:{key}:result"
+
+    def _redis_available(self) -> bool:
+        return bool(self.redis_url) and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning("single-flight %s: redis unavailable, coalescing in-process only: %s", self.namespace, exc)
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+
+    # asyncio
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """compute(), shared with every concurrent caller of the same key"""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is loop:
+            self.stats["coalesced"] += 1
+        else:
+            task = loop.create_task(self._run_shared(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved in case every caller went away
+            task.exception()
+
+    def _client(self) -> Optional[aioredis.Redis]:
+        if not self._redis_available():
+            return None
+        if self._redis is None:
+            self._redis = aioredis.Redis.from_url(
+                self.redis_url, socket_timeout=0.25, socket_connect_timeout=0.25
+            )
+        return self._redis
+
+    async def _run_shared(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        client = self._client()
+        if client is None:
+            self.stats["leader"] += 1
+            return await compute()
+
+        token = uuid.uuid4().hex
+        try:
+            leader = await client.set(self._lock_key(key), token, nx=True, px=int(self.lock_seconds * 1000))
+        except (RedisError, OSError) as exc:
+            self._redis_failed(exc)
+            self.stats["leader"] += 1
+            return await compute()
+
+        if leader:
+            self.stats["leader"] += 1
+            try:
+                value = await compute()
+                # Hand off before releasing, so a follower that sees the lock gone finds the result
+                try:
+                    await client.set(
+                        self._result_key(key), json.dumps(self.encode(value)), px=int(self.handoff_seconds * 1000)
+                    )
+                except (RedisError, OSError) as exc:
+                    self._redis_failed(exc)
+                return value
+            finally:
+                try:
+                    await client.eval(_RELEASE_SCRIPT, 1, self._lock_key(key), token)
+                except (RedisError, OSError):
+                    pass  # expires after lock_seconds
+
+        try:
+            raw = await self._await_handoff(client, key)
+        except (RedisError, OSError) as exc:
+            self._redis_failed(exc)
+            raw = None
+        if raw is not None:
+            self.stats["handoffs"] += 1
+            return self.decode(json.loads(raw))
+        # The leader failed or timed out
+        self.stats["fallbacks"] += 1
+        return await compute()
+
+    async def _await_handoff(self, client: aioredis.Redis, key: str) -> Optional[bytes]:
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            raw = await client.get(self._result_key(key))
+            if raw is not None:
+                return raw
+            if not await client.exists(self._lock_key(key)):
+                # Released (or expired) between the two reads
+                return await client.get(self._result_key(key))
+            await asyncio.sleep(self.poll_seconds)
+        return None
+
+    # Synchronous (Celery tasks, worker threads)
+
+    def run_sync(self, key: str, compute: Callable[[], T]) -> T:
+        """Blocking form of run()"""
+        with self._sync_lock:
+            flight = self._inflight_sync.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight_sync[key] = _SyncFlight()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            return flight.wait()
+        try:
+            flight.value = self._run_shared_sync(key, compute)
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._sync_lock:
+                del self._inflight_sync[key]
+            flight.done.set()
+        return flight.value
+
+    def _client_sync(self) -> Optional[redis.Redis]:
+        if not self._redis_available():
+            return None
+        if self._redis_sync is None:
+            self._redis_sync = redis.Redis.from_url(
+                self.redis_url, socket_timeout=0.25, socket_connect_timeout=0.25
+            )
+        return self._redis_sync
+
+    def _run_shared_sync(self, key: str, compute: Callable[[], T]) -> T:
+        client = self._client_sync()
+        if client is None:
+            self.stats["leader"] += 1
+            return compute()
+
+        token = uuid.uuid4().hex
+        try:
+            leader = client.set(self._lock_key(key), token, nx=True, px=int(self.lock_seconds * 1000))
+        except (RedisError, OSError) as exc:
+            self._redis_failed(exc)
+            self.stats["leader"] += 1
+            return compute()
+
+        if leader:
+            self.stats["leader"] += 1
+            try:
+                value = compute()
+                try:
+                    client.set(
+                        self._result_key(key), json.dumps(self.encode(value)), px=int(self.handoff_seconds * 1000)
+                    )
+                except (RedisError, OSError) as exc:
+                    self._redis_failed(exc)
+                return value
+            finally:
+                try:
+                    client.eval(_RELEASE_SCRIPT, 1, self._lock_key(key), token)
+                except (RedisError, OSError):
+                    pass
+
+        try:
+            raw = self._await_handoff_sync(client, key)
+        except (RedisError, OSError) as exc:
+            self._redis_failed(exc)
+            raw = None
+        if raw is not None:
+            self.stats["handoffs"] += 1
+            return self.decode(json.loads(raw))
+        self.stats["fallbacks"] += 1
+        return compute()
+
+    def _await_handoff_sync(self, client: redis.Redis, key: str) -> Optional[bytes]:
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            raw = client.get(self._result_key(key))
+            if raw is not None:
+                return raw
+            if not client.exists(self._lock_key(key)):
+                return client.get(self._result_key(key))
+            time.sleep(self.poll_seconds)
+        return None
+
+
+class _SyncFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
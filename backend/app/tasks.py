@@ -1,54 +1,147 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from typing import Dict, Any, List
+import hashlib
+import json
+from typing import Dict, Any, List, Optional
+from celery import chord, group
+from celery.signals import worker_process_init
 from .config import settings
-from .agents import DealScoutAgent, CartBuilderAgent, OrderExecutorAgent, MockProvider
-
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
-    future=True,
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+from .db import engine
+from .agents.agent_a_deal_scout import PriceAnalysis, _item_key
+from .ingest import ingest_feed
+from .schemas.groceries import CheckoutRequest, GroceryItem, PriceQuery, ProviderPrice
+from .singleflight import SingleFlight
+from .serialization import PackedPrices, dump_cart_plan, pack_prices, unpack_prices
+from .worker_state import get_worker_state, init_worker_state
 
 from .celery_app import celery_app
 
 
-def _default_providers():
-    return [
-        MockProvider("amazon_fresh", base_price_multiplier=1.00, delivery_fee=0, eta_minutes=90),
-        MockProvider("instacart", base_price_multiplier=1.02, delivery_fee=35, eta_minutes=120),
-        MockProvider("uber_eats", base_price_multiplier=1.08, delivery_fee=25, eta_minutes=30),
-    ]
+@worker_process_init.connect
+def _init_worker_process(**_):
+    # Pooled connections inherited from the parent must not be shared across the fork
+    engine.dispose(close=False)
+    init_worker_state()
+
+
+# Identical aggregate_prices calls running at the same time, on any worker, share one computation
+aggregate_flight: SingleFlight[Dict[str, Any]] = SingleFlight(
+    "aggregate_prices",
+    redis_url=settings.redis_url,
+    lock_seconds=settings.single_flight_lock_seconds,
+    poll_seconds=settings.single_flight_poll_seconds,
+)
+
+
+def _query_key(query: PriceQuery) -> str:
+    # Exact rather than canonical (price_query_key): the result lists items in query order and spelling
+    return hashlib.sha256(json.dumps(query.model_dump(mode="json"), sort_keys=True).encode()).hexdigest()
 
 
 @celery_app.task(name="aggregate_prices")
 def aggregate_prices_task(items: List[Dict[str, str]], location_pin: str | None = None) -> Dict[str, Any]:
-    scout = DealScoutAgent(_default_providers())
-    # Convert items to GroceryItem-like dicts expected by schemas in HTTP layer; here pass-through
-    from .schemas.groceries import PriceQuery
-
+    scout = get_worker_state().scout
     pq = PriceQuery(items=items, location_pin=location_pin)  # pydantic will coerce
-    res = scout.aggregate_prices(pq)
-    return res.model_dump()
+    return aggregate_flight.run_sync(_query_key(pq), lambda: scout.aggregate_prices(pq).model_dump())
 
 
-@celery_app.task(name="build_cart")
-def build_cart_task(price_items: List[Dict[str, Any]]) -> Dict[str, Any]:
-    builder = CartBuilderAgent()
-    from .schemas.groceries import ProviderPrice
+def price_fanout(
+    items: List[Dict[str, Any]],
+    location_pin: str | None = None,
+    chunk_size: Optional[int] = None,
+    per_provider: bool = False,
+):
+    """
+    Chord pricing items in parallel: one price_chunk subtask per chunk of
+    chunk_size items (CELERY_PRICE_CHUNK_SIZE), optionally split further
+    per provider, reduced by merge_price_chunks into the PriceResult shape
+    aggregate_prices returns.
+
+    Repeated items are priced once: chunks hold distinct item keys, so a
+    key only spans chunks of different providers.
+    """
+    chunk_size = chunk_size or settings.celery_price_chunk_size
+    distinct: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        distinct.setdefault(_item_key(GroceryItem(**item)), item)
+    unique_items = list(distinct.values())
+    provider_splits: List[Optional[List[str]]] = (
+        [[name] for name in get_worker_state().providers] if per_provider else [None]
+    )
+    # Chunk-major, provider-minor, so merging in group order keeps provider order per item
+    subtasks = group(
+        price_chunk_task.s(unique_items[start:start + chunk_size], location_pin, provider_names)
+        for start in range(0, len(unique_items), chunk_size)
+        for provider_names in provider_splits
+    )
+    return chord(subtasks, merge_price_chunks_task.s(items, location_pin))
+
 
-    prices = [ProviderPrice(**pi) for pi in price_items]
+@celery_app.task(name="aggregate_prices_fanout", bind=True)
+def aggregate_prices_fanout_task(
+    self,
+    items: List[Dict[str, Any]],
+    location_pin: str | None = None,
+    chunk_size: Optional[int] = None,
+    per_provider: bool = False,
+) -> Dict[str, Any]:
+    """
+    aggregate_prices spread across the worker fleet. Lists that fit in one
+    chunk are priced in place; larger ones replace this task with the
+    price_fanout chord, so the caller's AsyncResult still yields the merged
+    PriceResult.
+    """
+    if len(items) <= (chunk_size or settings.celery_price_chunk_size) and not per_provider:
+        return aggregate_prices_task(items, location_pin)
+    return self.replace(price_fanout(items, location_pin, chunk_size, per_provider))
+
+
+@celery_app.task(name="price_chunk")
+def price_chunk_task(
+    items: List[Dict[str, Any]],
+    location_pin: str | None = None,
+    provider_names: Optional[List[str]] = None,
+) -> Dict[str, PackedPrices]:
+    """Provider prices for a slice of a list, keyed like PriceAnalysis.item_prices (packed tables)"""
+    analysis = get_worker_state().scout_for(provider_names).analyze(PriceQuery(items=items, location_pin=location_pin))
+    return {key: pack_prices(prices) for key, prices in analysis.item_prices.items()}
+
+
+@celery_app.task(name="merge_price_chunks")
+def merge_price_chunks_task(
+    chunks: List[Dict[str, PackedPrices]],
+    items: List[Dict[str, Any]],
+    location_pin: str | None = None,
+) -> Dict[str, Any]:
+    """Chord callback: merge price_chunk results into one PriceResult"""
+    item_prices: Dict[str, List[ProviderPrice]] = {}
+    for chunk in chunks:
+        for key, prices in chunk.items():
+            merged = item_prices.setdefault(key, [])
+            # One price per provider and item, as aggregate_prices returns
+            seen = {price.provider for price in merged}
+            merged.extend(price for price in unpack_prices(prices) if price.provider not in seen)
+    query = PriceQuery(items=items, location_pin=location_pin)
+    return PriceAnalysis(query, item_prices).result.model_dump()
+
+
+@celery_app.task(name="build_cart")
+def build_cart_task(price_items: PackedPrices | List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cart plan for a packed price table (or a list of ProviderPrice dumps); option items come back packed"""
+    builder = get_worker_state().cart_builder
+    prices = unpack_prices(price_items)
     plan = builder.build_cart(prices)
-    return plan.model_dump()
+    return dump_cart_plan(plan)
 
 
 @celery_app.task(name="checkout")
 def checkout_task(req: Dict[str, Any]) -> Dict[str, Any]:
-    executor = OrderExecutorAgent()
-    from .schemas.groceries import CheckoutRequest
-
-    parsed = CheckoutRequest(**req)
+    executor = get_worker_state().executor
+    # Items may be a packed price table
+    parsed = CheckoutRequest(**{**req, "items": unpack_prices(req["items"])})
     out = executor.checkout(parsed)
     return out.model_dump()
+
+
+@celery_app.task(name="ingest_deals")
+def ingest_deals_task(path: str, fmt: str | None = None, batch_size: int | None = None) -> Dict[str, Any]:
+    """Stream a CSV/JSONL feed (a path the worker can read) into grocery_deals; returns the ingest report"""
+    return ingest_feed(path, fmt, batch_size=batch_size).as_dict()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start_ns: int  # time.perf_counter_ns()
+    end_ns: int = 0
+    thread_id: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """The spans recorded while a trace is active (see start_trace)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _open(self, name: str, parent_id: Optional[int], attributes: Dict[str, Any]) -> Span:
+        with self._lock:
+            opened = Span(name, next(self._ids), parent_id, 0, thread_id=threading.get_ident(), attributes=attributes)
+            self.spans.append(opened)
+        opened.start_ns = time.perf_counter_ns()
+        return opened
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        return chrome_trace(self.spans)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def start_trace() -> Iterator[Trace]:
+    """
+    Record spans for everything run inside the block, including work it
+    hands to asyncio tasks and asyncio.to_thread (both copy the context).
+    """
+    trace = Trace()
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span; a no-op outside start_trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    opened = trace._open(name, _current_span.get(), attributes)
+    token = _current_span.set(opened.span_id)
+    try:
+        yield opened
+    except BaseException as exc:
+        opened.attributes["error"] = repr(exc)
+        raise
+    finally:
+        opened.end_ns = time.perf_counter_ns()
+        _current_span.reset(token)
+
+
+def traced(name: str, attributes: Optional[Callable[..., Dict[str, Any]]] = None):
+    """
+    Decorator form of span(); attributes, if given, is called with the
+    function's arguments to label the span.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name, **(attributes(*args, **kwargs) if attributes else {})):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def chrome_trace(spans: List[Span]) -> Dict[str, Any]:
+    """
+    Chrome trace-event JSON ("X" complete events, microseconds), loadable in
+    chrome://tracing, Perfetto or speedscope for a flamegraph view.
+    """
+    origin = min((s.start_ns for s in spans), default=0)
+    pid = os.getpid()
+    return {
+        "traceEvents": [
+            {
+                "name": s.name,
+                "cat": s.name.split(".")[0],
+                "ph": "X",
+                "ts": (s.start_ns - origin) / 1000,
+                "dur": (s.end_ns - s.start_ns) / 1000,
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": {**s.attributes, "span_id": s.span_id, "parent_id": s.parent_id},
+            }
+            for s in spans
+        ],
+        "displayTimeUnit": "ms",
+    }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .agents import CartBuilderAgent, DealScoutAgent, MockProvider, OrderExecutorAgent, ProviderAdapter
+from .agents.agent_a_deal_scout import MOCK_PRICE_DATABASE
+from .agents.deal_catalog import deal_catalog, use_deal_catalog
+from .schemas.groceries import GroceryItem, PriceQuery
+
+
+def build_providers() -> List[ProviderAdapter]:
+    if use_deal_catalog():
+        return deal_catalog.providers()
+    return [
+        MockProvider("amazon_fresh", base_price_multiplier=1.00, delivery_fee=0, eta_minutes=90),
+        MockProvider("instacart", base_price_multiplier=1.02, delivery_fee=35, eta_minutes=120),
+        MockProvider("uber_eats", base_price_multiplier=1.08, delivery_fee=25, eta_minutes=30),
+    ]
+
+
+class WorkerState:
+    """
+    Agents and providers shared by every task a worker process runs.
+
+    The agents keep no per-call state (OrderExecutorAgent's preference
+    learning is meant to accumulate), so one instance per process serves
+    every task, and scouts for provider subsets are built once per subset.
+    """
+
+    def __init__(self):
+        self.providers: Dict[str, ProviderAdapter] = {p.name(): p for p in build_providers()}
+        self.scout = DealScoutAgent(self.providers.values())
+        self.cart_builder = CartBuilderAgent()
+        self.executor = OrderExecutorAgent()
+        self._scouts: Dict[Tuple[str, ...], DealScoutAgent] = {tuple(self.providers): self.scout}
+        self._lock = threading.Lock()
+
+    def scout_for(self, provider_names: Optional[Iterable[str]] = None) -> DealScoutAgent:
+        """Scout over the named providers (all of them when None), in registry order"""
+        if provider_names is None:
+            return self.scout
+        wanted = set(provider_names)
+        key = tuple(name for name in self.providers if name in wanted)
+        scout = self._scouts.get(key)
+        if scout is None:
+            with self._lock:
+                scout = self._scouts.setdefault(key, DealScoutAgent(self.providers[name] for name in key))
+        return scout
+
+    def warm(self) -> None:
+        """
+        Price the whole catalog and plan a cart for it once, so the first
+        real task does not pay first-use costs: the catalog index's name
+        cache, the NumPy pricing path, the cart solver and pydantic's
+        validators and serializers.
+        """
+        analysis = self.scout.analyze(
+            PriceQuery(items=[GroceryItem(name=name, quantity=1) for name in MOCK_PRICE_DATABASE])
+        )
+        analysis.result.model_dump()
+        self.cart_builder.build_cart(analysis.prices).model_dump()
+
+
+_state: Optional[WorkerState] = None
+_state_lock = threading.Lock()
+
+
+def init_worker_state() -> WorkerState:
+    """Build and warm this process's state (Celery worker_process_init)"""
+    global _state
+    with _state_lock:
+        if use_deal_catalog():
+            # Threads do not survive the prefork fork, so start refreshing here
+            deal_catalog.start()
+        _state = WorkerState()
+        _state.warm()
+    return _state
+
+
+def get_worker_state() -> WorkerState:
+    """This process's state, built on first use outside a worker (eager tasks, scripts)"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = WorkerState()
+    return _state